@@ -0,0 +1,377 @@
+# Headless rendering benchmark for CursorHighlight.
+#
+#   python3 benchmark.py --output results.json
+#   python3 benchmark.py --baseline results.json --tolerance 0.25
+#   python3 benchmark.py --startup 10
+#   python3 benchmark.py --replay session.cgrec --settings settings.json
+#   python3 benchmark.py --allocations 5000
+#
+# Renders into offscreen cairo ImageSurfaces, no display needed. --startup
+# launches the real app instead and needs a display (Xvfb works). --replay
+# plays back input recorded by the app with CURSORGLOW_RECORD=path through
+# the whole frame pipeline (input, animation, draw), as fast as possible or
+# with --realtime at the recorded pace.
+# --allocations runs steady-state frames under tracemalloc and fails if the
+# frame path keeps memory it allocated.
+import argparse
+import itertools
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import cairo
+
+from cursorglow_core import CursorHighlight, HighlightShape, Scene, read_input_log, union_rect
+
+SHAPES = [HighlightShape.ROUNDED_SQUARE, HighlightShape.CIRCLE]
+SIZES = [30, 50, 100]
+GLOW_SIZES = [0, 10, 30]
+ROTATIONS = [0, 45]
+STATES = ["idle", "pressed", "animating"]
+MODES = ["sprite", "vector"]  # Cached blit through draw() or the full vector render()
+
+FRAME_TIME = 1 / 60  # Simulated time step fed to update_animations
+ALLOCATION_CASES = {  # Steady states for --allocations, as settings applied to the scene
+    "still": {},
+    "moving": {},
+    "trail": {"trail_enabled": True},
+}
+WARMUP_FRAMES = 200  # Frames before tracing starts, long enough to fill every cache
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def make_highlight(shape, size, glow_size, rotation, state):
+    highlight = CursorHighlight()
+    highlight.apply_settings({"shape": shape, "size": size, "glow_size": glow_size, "rotation": rotation})
+    if state == "pressed":
+        highlight.left_press_target = 1.0
+        highlight.left_press_amount = 1.0
+    return highlight
+
+def run_case(shape, size, glow_size, rotation, state, mode, frames, width, height):
+    highlight = make_highlight(shape, size, glow_size, rotation, state)
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+    ctx = cairo.Context(surface)
+
+    now = 0.0
+    highlight.update_animations(now)
+    previous_rect = None
+    pixels = 0
+    update_times = []
+    draw_times = []
+
+    for frame in range(frames):
+        # Cursor sweeps a circle so every frame lands somewhere new
+        angle = frame * 0.05
+        x = width / 2 + math.cos(angle) * width / 4
+        y = height / 2 + math.sin(angle) * height / 4
+        if state == "animating" and frame % 20 == 0:
+            highlight.left_press_target = 1.0 - highlight.left_press_target
+        now += FRAME_TIME
+
+        start = time.perf_counter()
+        highlight.update_animations(now)
+        update_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        rect = highlight.bounds(x, y)
+        damage = union_rect(previous_rect, rect)
+        previous_rect = rect
+        ctx.save()
+        ctx.rectangle(*damage)
+        ctx.clip()
+        ctx.set_operator(cairo.OPERATOR_CLEAR)
+        ctx.paint()
+        ctx.set_operator(cairo.OPERATOR_OVER)
+        if mode == "sprite":
+            highlight.draw(ctx, x, y)
+        else:
+            squeeze_factor, offset = highlight.press_transform()
+            highlight.render(ctx, x + offset, y, squeeze_factor)
+        ctx.restore()
+        surface.flush()
+        draw_times.append(time.perf_counter() - start)
+        pixels += damage[2] * damage[3]
+
+    frame_times = sorted(u + d for u, d in zip(update_times, draw_times))
+    draw_times.sort()
+    total = sum(frame_times)
+    return {
+        "name": f"{shape.value}/size={size}/glow={glow_size}/rot={rotation}/{state}/{mode}",
+        "shape": shape.value,
+        "size": size,
+        "glow_size": glow_size,
+        "rotation": rotation,
+        "state": state,
+        "mode": mode,
+        "frames": frames,
+        "fps": frames / total if total > 0 else float("inf"),
+        "frame_us": {
+            "p50": percentile(frame_times, 0.5) * 1e6,
+            "p90": percentile(frame_times, 0.9) * 1e6,
+            "p99": percentile(frame_times, 0.99) * 1e6,
+        },
+        "draw_us_p50": percentile(draw_times, 0.5) * 1e6,
+        "update_us_mean": sum(update_times) / frames * 1e6,
+        "pixels_per_frame": pixels / frames,
+    }
+
+def draw_scene(ctx, scene):
+    # What the window does per frame: clear Scene.bounds(), like the fresh cairo node it
+    # gets, and paint the scene into it. Returns the painted rect.
+    rect = scene.bounds()
+    ctx.save()
+    ctx.rectangle(*rect)
+    ctx.clip()
+    ctx.set_operator(cairo.OPERATOR_CLEAR)
+    ctx.paint()
+    ctx.set_operator(cairo.OPERATOR_OVER)
+    scene.draw(ctx)
+    ctx.restore()
+    return rect
+
+def run_replay(path, settings, realtime, width, height):
+    events = read_input_log(path)
+    scene = Scene()
+    scene.highlight.apply_settings(settings)
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+    ctx = cairo.Context(surface)
+
+    # Frames follow a simulated 60 Hz frame clock that, like the app's, stops while
+    # nothing moves and restarts with the next event
+    now = 0.0
+    busy = False
+    next_event = 0
+    pixels = 0
+    update_times = []
+    draw_times = []
+    wall_start = time.perf_counter()
+
+    while next_event < len(events) or busy:
+        if not busy and events[next_event][0] > now:
+            now = math.ceil(events[next_event][0] / FRAME_TIME) * FRAME_TIME
+            scene.highlight.last_time = None
+        if realtime:
+            delay = wall_start + now - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+        start = time.perf_counter()
+        while next_event < len(events) and events[next_event][0] <= now:
+            t, button, pressed, x, y = events[next_event]
+            if button:
+                scene.button_event(t, button, pressed)
+            else:
+                scene.motion_event(t, x, y)
+            next_event += 1
+        busy = scene.update(now, now + FRAME_TIME)
+        update_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        rect = draw_scene(ctx, scene)
+        surface.flush()
+        draw_times.append(time.perf_counter() - start)
+        pixels += rect[2] * rect[3]
+        now += FRAME_TIME
+
+    frames = len(draw_times)
+    frame_times = sorted(u + d for u, d in zip(update_times, draw_times))
+    draw_times.sort()
+    total = sum(frame_times)
+    return {
+        "name": f"replay/{os.path.basename(path)}",
+        "mode": "replay",
+        "events": len(events),
+        "duration_s": events[-1][0] if events else 0.0,
+        "frames": frames,
+        "fps": frames / total if total > 0 else float("inf"),
+        "frame_us": {
+            "p50": percentile(frame_times, 0.5) * 1e6,
+            "p90": percentile(frame_times, 0.9) * 1e6,
+            "p99": percentile(frame_times, 0.99) * 1e6,
+        },
+        "draw_us_p50": percentile(draw_times, 0.5) * 1e6,
+        "update_us_mean": sum(update_times) / frames * 1e6 if frames else 0.0,
+        "pixels_per_frame": pixels / frames if frames else 0.0,
+    }
+
+def measure_allocations(name, frames, width, height):
+    # Memory the frame path (update + draw) still holds after `frames` steady-state frames,
+    # and the most it allocated and freed again within a single frame
+    scene = Scene()
+    scene.highlight.apply_settings(ALLOCATION_CASES[name])
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+    ctx = cairo.Context(surface)
+    moving = name != "still"
+
+    def frame(i):
+        now = i * FRAME_TIME
+        if moving:
+            angle = i * 0.05
+            scene.motion_event(now, width / 2 + math.cos(angle) * width / 4,
+                               height / 2 + math.sin(angle) * height / 4)
+        elif i == 0:
+            scene.motion_event(now, width / 2, height / 2)
+        scene.update(now, now + FRAME_TIME)
+        draw_scene(ctx, scene)
+
+    for i in range(WARMUP_FRAMES):
+        frame(i)
+
+    core = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cursorglow_core.py")
+    only_core = [tracemalloc.Filter(True, core)]
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot().filter_traces(only_core)
+    transient = 0
+    for i in range(WARMUP_FRAMES, WARMUP_FRAMES + frames):
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        frame(i)
+        transient = max(transient, tracemalloc.get_traced_memory()[1] - current)
+    after = tracemalloc.take_snapshot().filter_traces(only_core)
+    tracemalloc.stop()
+
+    growth = [stat for stat in after.compare_to(before, "lineno") if stat.count_diff > 0]
+    return {
+        "name": f"allocations/{name}",
+        "frames": frames,
+        "retained_blocks": sum(stat.count_diff for stat in growth),
+        "retained_bytes": sum(stat.size_diff for stat in growth),
+        "max_transient_bytes": transient,
+        "growing_lines": [str(stat.traceback[0]) for stat in growth],
+    }
+
+def measure_startup(runs):
+    # Time from spawning the app to its first highlight frame, the app prints a
+    # CLOCK_MONOTONIC timestamp which is comparable across processes
+    app = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cursorglow.py")
+    env = dict(os.environ, CURSORGLOW_STARTUP_PROBE="1")
+    times = []
+    for _ in range(runs):
+        launched = time.monotonic()
+        output = subprocess.run([sys.executable, app], env=env, capture_output=True,
+                                text=True, timeout=60).stdout
+        for line in output.splitlines():
+            if line.startswith("first-frame "):
+                times.append(float(line.split()[1]) - launched)
+                break
+        else:
+            raise RuntimeError("app exited without drawing a frame, is a display available?")
+    times.sort()
+    return {
+        "runs": runs,
+        "first_frame_ms": {
+            "min": times[0] * 1e3,
+            "p50": percentile(times, 0.5) * 1e3,
+            "max": times[-1] * 1e3,
+        },
+    }
+
+def compare(results, baseline, tolerance):
+    # Median frame time is the stable number, percentiles further out are too noisy to gate on
+    known = {case["name"]: case for case in baseline.get("cases", [])}
+    regressions = []
+    for case in results["cases"]:
+        old = known.get(case["name"])
+        if old is None:
+            continue
+        limit = old["frame_us"]["p50"] * (1 + tolerance)
+        if case["frame_us"]["p50"] > limit:
+            regressions.append((case["name"], old["frame_us"]["p50"], case["frame_us"]["p50"]))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark CursorHighlight rendering offscreen")
+    parser.add_argument("--frames", type=int, default=300, help="frames rendered per case")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--quick", action="store_true", help="only sweep the default size and rotation")
+    parser.add_argument("--startup", type=int, metavar="RUNS",
+                        help="measure app time-to-first-highlight-frame instead (needs a display)")
+    parser.add_argument("--replay", metavar="FILE",
+                        help="replay an input recording (CURSORGLOW_RECORD) through the frame pipeline instead")
+    parser.add_argument("--realtime", action="store_true",
+                        help="replay at the recorded pace instead of as fast as possible")
+    parser.add_argument("--settings", help="settings.json to apply for --replay, defaults otherwise")
+    parser.add_argument("--allocations", type=int, metavar="FRAMES",
+                        help="trace memory over this many steady-state frames instead")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="fail if results regress past this earlier --output file")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed median frame time increase over the baseline (fraction)")
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        startup = measure_startup(args.startup)
+        print(f"first frame after {startup['first_frame_ms']['p50']:.1f} ms "
+              f"(min {startup['first_frame_ms']['min']:.1f}, max {startup['first_frame_ms']['max']:.1f})")
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(startup, f, indent=2)
+        return 0
+
+    if args.allocations:
+        results = [measure_allocations(name, args.allocations, args.width, args.height)
+                   for name in ALLOCATION_CASES]
+        for result in results:
+            print(f"{result['name']:<24} retained {result['retained_blocks']:>5} blocks "
+                  f"{result['retained_bytes']:>8} B  transient max {result['max_transient_bytes']:>6} B/frame")
+            for line in result["growing_lines"]:
+                print(f"GROWS {line}", file=sys.stderr)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+        return 1 if any(result["retained_blocks"] for result in results) else 0
+
+    sizes = [50] if args.quick else SIZES
+    rotations = [0] if args.quick else ROTATIONS
+
+    if args.replay:
+        settings = {}
+        if args.settings:
+            with open(args.settings, "r") as f:
+                settings = json.load(f)
+        runs = [lambda: run_replay(args.replay, settings, args.realtime, args.width, args.height)]
+    else:
+        runs = [
+            lambda combination=combination: run_case(*combination, args.frames, args.width, args.height)
+            for combination in itertools.product(SHAPES, sizes, GLOW_SIZES, rotations, STATES, MODES)
+        ]
+
+    cases = []
+    for run in runs:
+        case = run()
+        cases.append(case)
+        print(f"{case['name']:<60} {case['fps']:>10.0f} fps  "
+              f"p50 {case['frame_us']['p50']:>8.1f} us  p99 {case['frame_us']['p99']:>8.1f} us  "
+              f"{case['pixels_per_frame']:>8.0f} px")
+
+    results = {
+        "cairo_version": cairo.cairo_version_string(),
+        "surface": [args.width, args.height],
+        "cases": cases,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for name, old, new in regressions:
+            print(f"REGRESSION {name}: {old:.1f} us -> {new:.1f} us", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,168 +1,222 @@
+import os
+import sys
+
+if __name__ == "__main__" and sys.argv[1:2] == ["export-cursors"]:
+    # `cursorglow.py export-cursors DIR` writes an Xcursor theme instead of starting the overlay.
+    # The export's spawned workers re-run the main script, so it becomes cursorglow_xcursor.py
+    # before anything loads GTK.
+    import runpy
+    del sys.argv[1]
+    runpy.run_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), "cursorglow_xcursor.py"),
+                   run_name="__main__")
+
 import gi
 gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
-from gi.repository import Gtk, Gdk, GLib, Gio, Adw
+from gi.repository import Gtk, Gdk, GLib, Gio
 import cairo
-import os
-import sys
-import math
-from enum import Enum
 import json
+import stat
+import tempfile
+import threading
 import time
+from enum import Enum
 from datetime import datetime
 
+from cursorglow_core import (
+    POWER_SAVER_TIER, QUALITY_FULL, QUALITY_HALF_RATE, SETTINGS, SETTINGS_BY_KEY, FrameStats,
+    InputRecorder, QualityGovernor, Renderer, Scene, SpriteWorker, save_atlas, validate_settings
+)
+from cursorglow_pointer import ExtraPointerSource, create_pointer_source
+
 APP_ID = "com.renchon.cursorglow"
 VERSION = "0.0.1"
 GITHUB_USER = "ren-chon"
 TWITTER_USER = "prod_ocean"
 
+SAVE_DELAY_MS = 500  # Settings changes within this window are written to disk once
+RELOAD_DELAY_MS = 200  # Wait for settings.json to stop changing before reloading it
+ATLAS_DELAY_MS = 1000  # Settings must stay unchanged this long before their sprite atlas is written
+HUD_RECT = (8, 8, 300, 86)  # Where the frame stats HUD is drawn (x, y, width, height)
+
+DBUS_INTERFACE = "com.renchon.cursorglow.Control"  # Exported on the app's object path
+DBUS_XML = f"""
+<node>
+  <interface name="{DBUS_INTERFACE}">
+    <method name="ApplySettings">
+      <arg type="a{{sv}}" name="settings" direction="in"/>
+      <arg type="as" name="changed" direction="out"/>
+    </method>
+    <method name="SwitchProfile">
+      <arg type="s" name="name" direction="in"/>
+      <arg type="as" name="changed" direction="out"/>
+    </method>
+    <method name="GetStats">
+      <arg type="a{{sv}}" name="stats" direction="out"/>
+    </method>
+  </interface>
+</node>
+"""
+
 class DisplayProtocol(Enum):
     X11 = "x11" 
     WAYLAND = "wayland"
 
-class HighlightShape(Enum):
-    CIRCLE = "circle"
-    ROUNDED_SQUARE = "rounded_square"
+def write_atomic(path, text):
+    # Write next to the target and rename over it, so readers never see a half written file.
+    # Through symlinks, so a linked settings file (e.g. from a dotfiles repo) stays linked,
+    # and keeping its permissions rather than mkstemp's owner-only 0600.
+    path = os.path.realpath(path)
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o666 & ~umask
+    fd, tmp_path = tempfile.mkstemp(prefix=".settings-", suffix=".tmp", dir=os.path.dirname(path))
+    try:
+        os.fchmod(fd, mode)
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
 
-class CursorHighlight:
-    def __init__(self):
-        self.size = 50  # Size of the outer shape
-        self.color = (1, 1, 1, 0.8)  # Main color it influences the inner shape's color
-        self.inner_opacity = 0.5  # Inner shape opacity
-        self.corner_radius = 15
-        self.rotation = 0
-        self.border_width = 4
-        self.inner_padding = 4
-        self.glow_size = 10.0  # Glow radius
-        self.glow_opacity = 0.3  # Glow opacity
-        self.shape = HighlightShape.ROUNDED_SQUARE  # Default shape
-        self.inner_stroke_width = 2  
-        self.animation_enabled = True  # New animation toggle (broken)
-        self.left_press_amount = 0.0  # Animation progress for left click (broken)
-        self.right_press_amount = 0.0  # Animation progress for right click (broken)
-        self.animation_speed = 5.0  # Increased animation speed constant (broken)
-        self.left_press_target = 0.0
-        self.right_press_target = 0.0
-        self.last_time = time.monotonic()  # Use monotonic time for animations
-        
-    def update_animations(self):
-        current_time = time.monotonic() 
-        delta_time = current_time - self.last_time
-        self.last_time = current_time
-        
-        if not self.animation_enabled:
+class SettingsStore:
+    def __init__(self, path, on_saved=None):
+        self.path = path
+        self.on_saved = on_saved  # Called on the main loop once per write with the error or None
+        self.on_reload = None  # Called with (settings, error) after settings.json changed on disk
+        self.writes = 0
+        self._pending = None  # Latest settings not written yet
+        self._timeout_id = 0
+        self._writer = None
+        self._written_text = None  # Last content we wrote, so our own writes don't reload
+        self._monitor = None
+        self._reload_id = 0
+        
+    def load(self):
+        with open(self.path, "r") as f:
+            return json.load(f)
+        
+    def schedule_save(self, settings):
+        # Coalesce bursts of changes (slider drags) into a single write
+        self._pending = settings
+        if self._timeout_id:
+            GLib.source_remove(self._timeout_id)
+        self._timeout_id = GLib.timeout_add(SAVE_DELAY_MS, self._on_timeout)
+        
+    def flush(self):
+        # Write whatever is pending right away and wait for it, used on shutdown
+        if self._timeout_id:
+            GLib.source_remove(self._timeout_id)
+            self._timeout_id = 0
+        if self._writer is not None:
+            self._writer.join()
+        if self._pending is not None:
+            settings, self._pending = self._pending, None
+            write_atomic(self.path, json.dumps(settings, indent=2))
+            self.writes += 1
+        
+    def watch(self, on_reload):
+        # Follow edits made by other programs (config management, text editors)
+        self.on_reload = on_reload
+        self._monitor = Gio.File.new_for_path(self.path).monitor_file(Gio.FileMonitorFlags.NONE, None)
+        self._monitor.connect("changed", self._on_file_changed)
+        
+    def _on_file_changed(self, monitor, file, other_file, event_type):
+        # Atomic replacements show up as CREATED, in-place edits end with CHANGES_DONE_HINT
+        if event_type not in (Gio.FileMonitorEvent.CHANGES_DONE_HINT, Gio.FileMonitorEvent.CREATED):
             return
+        if self._reload_id:
+            GLib.source_remove(self._reload_id)
+        self._reload_id = GLib.timeout_add(RELOAD_DELAY_MS, self._on_reload_timeout)
         
-        if self.left_press_target > self.left_press_amount:
-            self.left_press_amount = min(
-                self.left_press_amount + self.animation_speed * delta_time,
-                self.left_press_target
-            )
-        else:
-            self.left_press_amount = max(
-                self.left_press_amount - self.animation_speed * delta_time,
-                self.left_press_target
-            )
-            
-        if self.right_press_target > self.right_press_amount:
-            self.right_press_amount = min(
-                self.right_press_amount + self.animation_speed * delta_time,
-                self.right_press_target
-            )
-        else:
-            self.right_press_amount = max(
-                self.right_press_amount - self.animation_speed * delta_time,
-                self.right_press_target
-            )
-    
-    def draw(self, ctx, x, y):
-        ctx.save()
-        
-        if self.animation_enabled:
-            if self.shape == HighlightShape.CIRCLE:
-                #  squeeze effect
-                squeeze_factor = 1.0
-                if self.left_press_amount > 0:
-                    squeeze_factor = 1.0 - (self.left_press_amount * 0.2)
-                elif self.right_press_amount > 0:
-                    squeeze_factor = 1.0 - (self.right_press_amount * 0.2)
-                ctx.translate(x, y)
-                ctx.scale(squeeze_factor, 1.0)
-                ctx.translate(-x, -y)
-            else:
-                # For rounded square, apply translation effect
-                offset = 0
-                if self.left_press_amount > 0:
-                    offset = self.left_press_amount * 10
-                elif self.right_press_amount > 0:
-                    offset = -self.right_press_amount * 10
-                ctx.translate(offset, 0)
-        
-        ctx.translate(x, y)
-        ctx.rotate(math.radians(self.rotation))
-        ctx.translate(-x, -y)
-        
-        #  glow
-        glow_size_int = int(self.glow_size)
-        for i in range(glow_size_int, 0, -2):
-            opacity = self.glow_opacity * (i / self.glow_size)
-            ctx.set_source_rgba(*self.color[:3], opacity)
-            ctx.set_line_width(self.border_width + i*2)
-            
-            half_size = self.size / 2
-            glow_x = x - half_size - i
-            glow_y = y - half_size - i
-            glow_size = self.size + i*2
-            
-            if self.shape == HighlightShape.CIRCLE:
-                self._draw_circle(ctx, x, y, (glow_size) / 2)
-            else:
-                self._draw_rounded_rect(ctx, glow_x, glow_y, glow_size, glow_size, self.corner_radius + i)
-            ctx.stroke()
-        
-        #  outer shape
-        ctx.set_source_rgba(*self.color)
-        ctx.set_line_width(self.border_width)
+    def _on_reload_timeout(self):
+        self._reload_id = 0
+        try:
+            with open(self.path, "r") as f:
+                text = f.read()
+        except OSError:
+            return GLib.SOURCE_REMOVE
+        except ValueError as e:
+            # Not UTF-8, as bad as malformed JSON
+            self.on_reload(None, e)
+            return GLib.SOURCE_REMOVE
+        if text == self._written_text:
+            return GLib.SOURCE_REMOVE
         
-        half_size = self.size / 2
-        outer_x = x - half_size
-        outer_y = y - half_size
+        try:
+            settings = validate_settings(json.loads(text))
+        except ValueError as e:
+            # Keep running with what we have, the next good write will be picked up
+            self.on_reload(None, e)
+            return GLib.SOURCE_REMOVE
+        self.on_reload(settings, None)
+        return GLib.SOURCE_REMOVE
+        
+    def _on_timeout(self):
+        self._timeout_id = 0
+        self._start_write()
+        return GLib.SOURCE_REMOVE
+        
+    def _start_write(self):
+        # One write in flight at a time, later changes wait for it to finish
+        if self._writer is not None or self._pending is None:
+            return
+        settings, self._pending = self._pending, None
+        self._written_text = json.dumps(settings, indent=2)
+        self._writer = threading.Thread(target=self._write, args=(self._written_text,), daemon=True)
+        self._writer.start()
         
-        if self.shape == HighlightShape.CIRCLE:
-            self._draw_circle(ctx, x, y, half_size)
-        else:
-            self._draw_rounded_rect(ctx, outer_x, outer_y, self.size, self.size, self.corner_radius)
-        ctx.stroke()
-        
-        #  inner shape
-        inner_offset = self.border_width + self.inner_padding
-        inner_size = self.size - (inner_offset * 2)
-        inner_x = outer_x + inner_offset
-        inner_y = outer_y + inner_offset
-        inner_radius = max(0, self.corner_radius - inner_offset)
-        
-        ctx.set_source_rgba(*self.color[:3], self.inner_opacity)
-        ctx.set_line_width(self.inner_stroke_width)
-        if self.shape == HighlightShape.CIRCLE:
-            self._draw_circle(ctx, x, y, inner_size / 2)
-        else:
-            self._draw_rounded_rect(ctx, inner_x, inner_y, inner_size, inner_size, inner_radius)
-        ctx.stroke()
+    def _write(self, text):
+        error = None
+        try:
+            write_atomic(self.path, text)
+        except OSError as e:
+            error = e
+        GLib.idle_add(self._on_written, error)
+        
+    def _on_written(self, error):
+        self._writer = None
+        self.writes += 1
+        if self.on_saved:
+            self.on_saved(error)
+        if not self._timeout_id:
+            self._start_write()
+        return GLib.SOURCE_REMOVE
+
+class BatteryMonitor:
+    def __init__(self, on_changed):
+        # Follows UPower's OnBattery, stays False without UPower or a system bus
+        self.on_battery = False
+        self.on_changed = on_changed
+        self.proxy = None
+        Gio.DBusProxy.new_for_bus(
+            Gio.BusType.SYSTEM, Gio.DBusProxyFlags.NONE, None, "org.freedesktop.UPower",
+            "/org/freedesktop/UPower", "org.freedesktop.UPower", None, self.on_proxy_ready
+        )
         
-        ctx.restore()
-    
-    def _draw_rounded_rect(self, ctx, x, y, width, height, radius):
-        ctx.new_sub_path()
-        ctx.arc(x + width - radius, y + radius, radius, -math.pi/2, 0)
-        ctx.arc(x + width - radius, y + height - radius, radius, 0, math.pi/2)
-        ctx.arc(x + radius, y + height - radius, radius, math.pi/2, math.pi)
-        ctx.arc(x + radius, y + radius, radius, math.pi, 3*math.pi/2)
-        ctx.close_path()
-    
-    def _draw_circle(self, ctx, x, y, radius):
-        ctx.new_sub_path()
-        ctx.arc(x, y, radius, 0, 2 * math.pi)
-        ctx.close_path()
+    def on_proxy_ready(self, source, result):
+        try:
+            self.proxy = Gio.DBusProxy.new_for_bus_finish(result)
+        except GLib.Error:
+            return
+        self.proxy.connect("g-properties-changed", self.on_properties_changed)
+        self.on_properties_changed(self.proxy, None, None)
+        
+    def on_properties_changed(self, proxy, changed, invalidated):
+        value = self.proxy.get_cached_property("OnBattery")
+        on_battery = value is not None and value.unpack()
+        if on_battery != self.on_battery:
+            self.on_battery = on_battery
+            self.on_changed()
 
 class CursorProWindow(Gtk.ApplicationWindow):
     def __init__(self, app):
@@ -193,8 +247,8 @@ class CursorProWindow(Gtk.ApplicationWindow):
         self.overlay = Gtk.Overlay()
         self.set_child(self.overlay)
         
-        self.toast_overlay = Adw.ToastOverlay()
-        self.overlay.add_overlay(self.toast_overlay)
+        # Adw.ToastOverlay is created on the first toast, see show_toast()
+        self.toast_overlay = None
         
         welcome_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=12)
         welcome_box.set_valign(Gtk.Align.CENTER)
@@ -209,126 +263,340 @@ class CursorProWindow(Gtk.ApplicationWindow):
         
         self.overlay.add_overlay(welcome_box)
         
-        # can't draw outside window
-        self.drawing_area = Gtk.DrawingArea()
-        self.drawing_area.set_draw_func(self.draw)
-        self.overlay.add_overlay(self.drawing_area)
-        
-        self.cursor_x = 0
-        self.cursor_y = 0
-        self.highlight = CursorHighlight()
-        
-        motion_controller = Gtk.EventControllerMotion()
-        motion_controller.connect("motion", self.on_motion)
-        self.add_controller(motion_controller)
-        
-        GLib.timeout_add(16, self.update_animations)  # ~60 FPS
-        
-        click_controller = Gtk.GestureClick()
-        click_controller.connect("pressed", self.on_button_pressed)
-        click_controller.connect("released", self.on_button_released)
-        self.add_controller(click_controller)
+        # can't draw outside window, the view is a HighlightView added by update_renderer()
+        self.view = None
+        self.renderer = None
+        
+        # Cursor, highlight, trail and ripples, advanced by on_tick() and drawn by the view
+        self.scene = Scene()
+        self.highlight = self.scene.highlight
+        # Frame timing instrumentation, off unless asked for since it costs a little per frame
+        self.stats = self.scene.stats = FrameStats() if os.environ.get("CURSORGLOW_STATS") else None
+        self.hud_visible = self.stats is not None
+        # Lowers the quality tier when frames take too long for the refresh rate, see frame_drawn()
+        self.governor = QualityGovernor()
+        self.refresh_interval = 0.0  # Seconds, from the frame clock
+        self.skip_tick = False  # Alternates at QUALITY_HALF_RATE
+        self.battery = None  # BatteryMonitor, created once power_saver is turned on
+        # Set by `benchmark.py --startup`, report the first highlight frame and quit
+        self.startup_probe = bool(os.environ.get("CURSORGLOW_STARTUP_PROBE"))
+        # CURSORGLOW_RECORD=path logs pointer input for `benchmark.py --replay`
+        record_path = os.environ.get("CURSORGLOW_RECORD")
+        self.recorder = InputRecorder(record_path) if record_path else None
+        
+        # Pointer events come from a PointerSource picked once the window has a surface
+        self.pointer_source = None
+        self.extra_pointer_source = None
+        self.expiry_id = 0  # Timeout that drops idle extra pointers while the tick is off
+        self.connect("realize", self.on_realize)
+        
+        # Frame clock tick callback, only registered while something is moving
+        self.tick_id = 0
         
         # keyboard shortcut (preview on the side ctrl+p)
         key_controller = Gtk.EventControllerKey()
         key_controller.connect("key-pressed", self.on_key_pressed)
         self.add_controller(key_controller)
         
-        self.last_time = time.monotonic()
+        self.config_dir = os.path.join(GLib.get_user_config_dir(), "cursorglow")
+        os.makedirs(self.config_dir, exist_ok=True)
+        self.settings_store = SettingsStore(
+            os.path.join(self.config_dir, "settings.json"), self.on_settings_saved
+        )
+        
+        # Rendered sprites are kept between runs so startup doesn't have to rasterize them
+        self.highlight.atlas_dir = os.path.join(GLib.get_user_cache_dir(), "cursorglow")
+        os.makedirs(self.highlight.atlas_dir, exist_ok=True)
+        self.atlas_id = 0
+        self.atlas_writer = None  # Thread rendering and writing the atlas
+        # Sprites for changed settings are rendered off the main loop, e.g. while a slider is dragged
+        self.sprite_worker = SpriteWorker(lambda *args: GLib.idle_add(self.on_sprite_rendered, *args))
+        self.highlight.sprite_worker = self.sprite_worker
         
         self.load_settings()
+        self.schedule_atlas()
+        self.update_renderer()
+        self.update_power_policy()
+        self.settings_store.watch(self.on_settings_reloaded)
         
     def load_settings(self):
         try:
-            config_dir = GLib.get_user_config_dir()
-            app_config_dir = os.path.join(config_dir, "cursorglow")
-            os.makedirs(app_config_dir, exist_ok=True)
-            settings_path = os.path.join(app_config_dir, "settings.json")
-            
-            with open(settings_path, "r") as f:
-                settings = json.load(f)
-                
-                # Load shape first since other settings may depend on it
-                shape_str = settings.get("shape", HighlightShape.ROUNDED_SQUARE.value)
-                self.highlight.shape = HighlightShape(shape_str)
-                
-                self.highlight.size = settings.get("size", 50)
-                self.highlight.color = tuple(settings.get("color", [1, 1, 1, 0.8]))
-                self.highlight.corner_radius = settings.get("corner_radius", 15)
-                self.highlight.rotation = settings.get("rotation", 0)
-                self.highlight.border_width = settings.get("border_width", 4)
-                self.highlight.inner_stroke_width = settings.get("inner_stroke_width", 2)
-                self.highlight.animation_enabled = settings.get("animation_enabled", True)
-                self.highlight.animation_speed = settings.get("animation_speed", 5.0)
-                self.highlight.inner_opacity = settings.get("inner_opacity", 0.5)
-                self.highlight.glow_size = settings.get("glow_size", 10.0)
-                self.highlight.glow_opacity = settings.get("glow_opacity", 0.3)
-                
+            settings = validate_settings(self.settings_store.load())
         except FileNotFoundError:
-            pass
+            return
+        except (OSError, ValueError) as e:
+            # Start with the defaults, the same file is ignored when it changes while running
+            self.show_toast(f"Ignored invalid settings.json: {e}")
+            return
+        self.highlight.apply_settings(settings)
             
     def save_settings(self):
-        config_dir = GLib.get_user_config_dir()
-        app_config_dir = os.path.join(config_dir, "cursorglow")
-        os.makedirs(app_config_dir, exist_ok=True)
-        settings_path = os.path.join(app_config_dir, "settings.json")
-        
-        settings = {
-            "size": self.highlight.size,
-            "color": list(self.highlight.color),
-            "corner_radius": self.highlight.corner_radius,
-            "rotation": self.highlight.rotation,
-            "shape": self.highlight.shape.value,
-            "border_width": self.highlight.border_width,
-            "inner_stroke_width": self.highlight.inner_stroke_width,
-            "animation_enabled": self.highlight.animation_enabled,
-            "animation_speed": self.highlight.animation_speed,
-            "inner_opacity": self.highlight.inner_opacity,
-            "glow_size": self.highlight.glow_size,
-            "glow_opacity": self.highlight.glow_opacity
-        }
-        
-        with open(settings_path, "w") as f:
-            json.dump(settings, f, indent=2)
-            
-        # TODO: fix spam
-        toast = Adw.Toast.new("Settings saved")
-        toast.set_timeout(1)
-        self.toast_overlay.add_toast(toast)
-            
-    def on_motion(self, controller, x, y):
-        self.cursor_x = x
-        self.cursor_y = y
-        self.drawing_area.queue_draw()
-        
-    def update_animations(self):
-        current_time = time.monotonic()
-        self.highlight.update_animations()
-        self.drawing_area.queue_draw()
-        return True
+        self.settings_store.schedule_save(self.highlight.to_settings())
         
-    def draw(self, area, ctx, width, height):
-        # Clear the surface
-        ctx.set_operator(cairo.OPERATOR_CLEAR)
-        ctx.paint()
-        ctx.set_operator(cairo.OPERATOR_OVER)
+    def on_settings_reloaded(self, settings, error):
+        if error is not None:
+            self.show_toast(f"Ignored invalid settings.json: {error}")
+            return
+        # A key removed from the file goes back to its default
+        settings = {**{setting.key: setting.default for setting in SETTINGS}, **settings}
+        if self.highlight.apply_settings(settings):
+            self.update_renderer()
+            self.update_power_policy()
+            self.schedule_atlas()
+            self.wake()
+            self.sync_preferences()
+        
+    def apply_settings(self, settings):
+        # Any number of settings with one redraw and one save, returns the changed keys
+        changed = self.highlight.apply_settings(settings)
+        if changed:
+            self.settings_changed()
+            self.sync_preferences()
+        return changed
+        
+    def switch_profile(self, name):
+        # Profiles are partial settings files in profiles/, keys they leave out get their defaults.
+        # Raises FileNotFoundError for unknown profiles and ValueError for malformed ones.
+        if not name or name in (".", "..") or os.path.basename(name) != name:
+            raise ValueError(f"invalid profile name {name!r}")
+        with open(os.path.join(self.config_dir, "profiles", f"{name}.json"), "r") as f:
+            profile = validate_settings(json.load(f))
+        return self.apply_settings({**{setting.key: setting.default for setting in SETTINGS}, **profile})
+        
+    def schedule_atlas(self):
+        # Write the atlas once the settings settle, not for every slider step
+        if self.atlas_id:
+            GLib.source_remove(self.atlas_id)
+        self.atlas_id = GLib.timeout_add(ATLAS_DELAY_MS, self.on_atlas_timeout)
+        
+    def on_atlas_timeout(self):
+        self.atlas_id = 0
+        scale = self.highlight.drawn_scale()
+        if self.atlas_writer is not None or scale is None:
+            # One at a time, and only for a scale frames are drawn at. The gsk renderer
+            # doesn't use sprites, so it never needs one.
+            if self.renderer == Renderer.CAIRO:
+                self.schedule_atlas()
+            return GLib.SOURCE_REMOVE
+        # Rendering every press step takes a while, keep it off the main loop
+        args = (self.highlight.atlas_dir, self.highlight.to_settings(), scale)
+        self.atlas_writer = threading.Thread(target=self.write_atlas, args=args, daemon=True)
+        self.atlas_writer.start()
+        return GLib.SOURCE_REMOVE
+        
+    def write_atlas(self, directory, settings, scale):
+        try:
+            written = save_atlas(directory, settings, scale)
+        except OSError:
+            written = False  # Only costs the next startup some rendering
+        GLib.idle_add(self.on_atlas_written, written)
+        
+    def on_atlas_written(self, written):
+        self.atlas_writer = None
+        if written:
+            self.highlight.reload_atlas()
+        return GLib.SOURCE_REMOVE
+        
+    def on_sprite_rendered(self, version, squeeze_factor, scale, sprite):
+        if self.highlight.add_sprite(version, squeeze_factor, scale, sprite):
+            self.wake()
+        return GLib.SOURCE_REMOVE
+        
+    def sync_preferences(self):
+        preferences = self.get_application().preferences
+        if preferences is not None:
+            preferences.sync()
+        
+    def on_settings_saved(self, error):
+        # One toast per coalesced write instead of one per slider step
+        if error is not None:
+            self.show_toast(f"Could not save settings: {error.strerror}")
+        else:
+            self.show_toast("Settings saved", timeout=1)
+        
+    def show_toast(self, title, timeout=None):
+        from gi.repository import Adw
+        if self.toast_overlay is None:
+            self.toast_overlay = Adw.ToastOverlay()
+            self.toast_overlay.set_can_target(False)
+            self.overlay.add_overlay(self.toast_overlay)
+        toast = Adw.Toast.new(title)
+        if timeout is not None:
+            toast.set_timeout(timeout)
+        self.toast_overlay.add_toast(toast)
         
-        # Draw highlight
-        self.highlight.draw(ctx, self.cursor_x, self.cursor_y)
+    def update_renderer(self):
+        # Both renderers draw through the same view, switching only changes what it snapshots
+        if self.renderer == self.highlight.renderer:
+            return
+        self.renderer = self.highlight.renderer
+        if self.view is None:
+            from cursorglow_gsk import HighlightView
+            self.view = HighlightView(self)
+            self.overlay.add_overlay(self.view)
+        self.view.queue_draw()
+        
+    def update_power_policy(self):
+        # With power_saver on, quality never goes above POWER_SAVER_TIER while on battery
+        if self.highlight.power_saver and self.battery is None:
+            self.battery = BatteryMonitor(self.update_power_policy)
+        saving = self.highlight.power_saver and self.battery is not None and self.battery.on_battery
+        if self.governor.set_floor(POWER_SAVER_TIER if saving else QUALITY_FULL):
+            self.quality_changed()
+        
+    def quality_changed(self):
+        self.scene.set_quality(self.governor.tier)
+        preferences = self.get_application().preferences
+        if preferences is not None:
+            preferences.update_quality(self.governor.tier)
+        self.wake()
+        
+    def on_realize(self, window):
+        self.pointer_source = create_pointer_source(self, self.on_motion, self.on_pointer_button)
+        self.pointer_source.start()
+        self.extra_pointer_source = ExtraPointerSource(self, self.on_extra_pointer)
+        self.extra_pointer_source.start()
+        
+    def on_motion(self, x, y):
+        t = GLib.get_monotonic_time() / 1e6
+        self.scene.motion_event(t, x, y)
+        if self.recorder is not None:
+            self.recorder.motion(t, x, y)
+        self.wake()
+        
+    def on_extra_pointer(self, key, kind, x, y, button):
+        self.scene.pointer_event(GLib.get_monotonic_time() / 1e6, key, kind, x, y, button)
+        self.wake()
+        
+    def on_pointer_expiry(self):
+        self.expiry_id = 0
+        self.wake()
+        return GLib.SOURCE_REMOVE
+        
+    def wake(self):
+        # Follow the frame clock (and so the monitor refresh rate) until things settle again
+        if not self.tick_id:
+            self.highlight.last_time = None
+            if self.stats is not None:
+                self.stats.last_frame_time = None
+            self.tick_id = self.add_tick_callback(self.on_tick)
+        
+    def on_tick(self, widget, frame_clock):
+        if self.scene.quality >= QUALITY_HALF_RATE:
+            self.skip_tick = not self.skip_tick
+            if self.skip_tick:
+                return GLib.SOURCE_CONTINUE
+        frame_time = frame_clock.get_frame_time()
+        now = frame_time / 1e6
+        refresh_interval, presentation_time = frame_clock.get_refresh_info(frame_time)
+        self.refresh_interval = refresh_interval / 1e6
+        if not presentation_time:
+            presentation_time = frame_time + (refresh_interval or 16667)
+        if self.stats is not None:
+            # At half rate every other tick is skipped on purpose, that's not a missed frame
+            frame_interval = refresh_interval / 1e6
+            if self.scene.quality >= QUALITY_HALF_RATE:
+                frame_interval *= 2
+            self.stats.tick(now, frame_interval)
+            if self.scene.motion.pending:
+                self.stats.latency.record(presentation_time / 1e6 - self.scene.motion.latest_time())
+        
+        busy = self.scene.update(now, presentation_time / 1e6)
+        self.view.queue_draw()
+        
+        # Motion and clicks call wake() again, so nothing is missed while idle
+        if not busy:
+            self.tick_id = 0
+            expiry = self.scene.pointers.next_expiry()
+            if expiry is not None and not self.expiry_id:
+                self.expiry_id = GLib.timeout_add(max(int((expiry - now) * 1000), 0) + 1, self.on_pointer_expiry)
+            return GLib.SOURCE_REMOVE
+        return GLib.SOURCE_CONTINUE
+    
+    def toggle_hud(self):
+        if self.stats is None:
+            self.stats = self.scene.stats = FrameStats()
+        self.hud_visible = not self.hud_visible
+        self.view.queue_draw()
+        
+    def stats_summary(self):
+        # Asking for stats starts collecting them
+        if self.stats is None:
+            self.stats = self.scene.stats = FrameStats()
+        return {**self.stats.summary(), "quality_tier": self.governor.tier}
+        
+    def dump_stats(self):
+        if self.stats is None:
+            self.show_toast("Frame stats are off, press Ctrl+Shift+D first")
+            return
+        cache_dir = os.path.join(GLib.get_user_cache_dir(), "cursorglow")
+        os.makedirs(cache_dir, exist_ok=True)
+        path = os.path.join(cache_dir, f"frame-stats-{datetime.now():%Y%m%d-%H%M%S}.json")
+        with open(path, "w") as f:
+            json.dump(self.stats.as_dict(), f, indent=2)
+        self.show_toast(f"Frame stats written to {path}")
+        
+    def set_setting(self, key, value):
+        if self.highlight.set_setting(key, value):
+            self.settings_changed()
+        
+    def settings_changed(self):
+        self.update_renderer()
+        self.update_power_policy()
+        self.wake()
+        self.save_settings()
+        self.schedule_atlas()
+        
+    def snapshot_frame(self, snapshot):
+        # GTK works out the damage from the nodes, so each frame only builds what is visible.
+        # Renderer.CAIRO paints into one cairo node the size of the scene, Renderer.GSK
+        # builds the highlights from render nodes.
+        from cursorglow_gsk import append_cairo, append_highlight
+        start = time.perf_counter()
+        
+        if self.renderer == Renderer.CAIRO:
+            self.scene.draw(append_cairo(snapshot, self.scene.bounds()))
+        else:
+            rect = self.scene.effects_bounds()
+            if rect is not None:
+                self.scene.draw_effects(append_cairo(snapshot, rect))
+            for x, y, squeeze_factor, offset in self.scene.pointers.transforms(self.highlight):
+                append_highlight(snapshot, self.highlight, x, y, (squeeze_factor, offset))
+            append_highlight(snapshot, self.highlight, self.scene.cursor_x, self.scene.cursor_y)
+        
+        self.frame_drawn(time.perf_counter() - start)
+        if self.stats is not None and self.hud_visible:
+            self.draw_hud(append_cairo(snapshot, HUD_RECT))
+        
+    def frame_drawn(self, draw_time):
+        if self.stats is not None:
+            self.stats.draw.record(draw_time)
+        if self.governor.record(draw_time, self.refresh_interval):
+            self.quality_changed()
+        if self.startup_probe:
+            self.startup_probe = False
+            print(f"first-frame {time.monotonic():.6f}", flush=True)
+            GLib.idle_add(self.get_application().quit)
     
-    def on_button_pressed(self, gesture, n_press, x, y):
-        button = gesture.get_current_button()
-        if button == 1:  # Left click
-            self.highlight.left_press_target = 1.0
-        elif button == 3:  # Right click
-            self.highlight.right_press_target = 1.0
+    def draw_hud(self, ctx):
+        x, y, width, height = HUD_RECT
+        ctx.set_source_rgba(0, 0, 0, 0.6)
+        ctx.rectangle(x, y, width, height)
+        ctx.fill()
+        
+        ctx.set_source_rgba(1, 1, 1, 0.9)
+        ctx.select_font_face("monospace", cairo.FONT_SLANT_NORMAL, cairo.FONT_WEIGHT_NORMAL)
+        ctx.set_font_size(11)
+        for i, line in enumerate(self.stats.hud_lines()):
+            ctx.move_to(x + 8, y + 20 + i * 18)
+            ctx.show_text(line)
     
-    def on_button_released(self, gesture, n_press, x, y):
-        button = gesture.get_current_button()
-        if button == 1:  # Left click
-            self.highlight.left_press_target = 0.0
-        elif button == 3:  # Right click
-            self.highlight.right_press_target = 0.0
+    def on_pointer_button(self, button, pressed):
+        t = GLib.get_monotonic_time() / 1e6
+        self.scene.button_event(t, button, pressed)
+        if self.recorder is not None:
+            self.recorder.button(t, button, pressed, self.scene.cursor_x, self.scene.cursor_y)
+        self.wake()
             
     def on_key_pressed(self, controller, keyval, keycode, state):
         #  ctrl+P to open preferences
@@ -337,225 +605,64 @@ class CursorProWindow(Gtk.ApplicationWindow):
             return True
         return False
 
-class PreferencesDialog(Adw.PreferencesWindow):
-    def __init__(self, parent):
-        super().__init__(title="Preferences", transient_for=parent)
-        
-        page = Adw.PreferencesPage()
-        self.add(page)
-        
-        #  appearance group
-        appearance_group = Adw.PreferencesGroup(title="Appearance")
-        page.add(appearance_group)
-        
-        size_row = Adw.ActionRow(title="Size")
-        size_adj = Gtk.Adjustment(value=parent.highlight.size, lower=10, upper=100, step_increment=1)
-        size_scale = Gtk.Scale(adjustment=size_adj, orientation=Gtk.Orientation.HORIZONTAL)
-        size_scale.set_hexpand(True)
-        size_scale.set_draw_value(True)  # Show the current value
-        size_scale.set_value_pos(Gtk.PositionType.RIGHT)  # Position value on right
-        size_scale.connect("value-changed", self.on_size_changed, parent)
-        size_row.add_suffix(size_scale)
-        appearance_group.add(size_row)
-        
-        radius_row = Adw.ActionRow(title="Corner Radius")
-        radius_adj = Gtk.Adjustment(value=parent.highlight.corner_radius, lower=0, upper=50, step_increment=1)
-        radius_scale = Gtk.Scale(adjustment=radius_adj, orientation=Gtk.Orientation.HORIZONTAL)
-        radius_scale.set_hexpand(True)
-        radius_scale.set_draw_value(True)  # Show the current value
-        radius_scale.set_value_pos(Gtk.PositionType.RIGHT)  # Position value on right
-        radius_scale.connect("value-changed", self.on_radius_changed, parent)
-        radius_row.add_suffix(radius_scale)
-        appearance_group.add(radius_row)
-        
-        rotation_row = Adw.ActionRow(title="Rotation")
-        rotation_adj = Gtk.Adjustment(value=parent.highlight.rotation, lower=0, upper=360, step_increment=1)
-        rotation_scale = Gtk.Scale(adjustment=rotation_adj, orientation=Gtk.Orientation.HORIZONTAL)
-        rotation_scale.set_hexpand(True)
-        rotation_scale.set_draw_value(True)  # Show the current value
-        rotation_scale.set_value_pos(Gtk.PositionType.RIGHT)  # Position value on right
-        rotation_scale.connect("value-changed", self.on_rotation_changed, parent)
-        rotation_row.add_suffix(rotation_scale)
-        appearance_group.add(rotation_row)
-        
-        color_row = Adw.ActionRow(title="Color")
-        color_button = Gtk.ColorButton()
-        color = Gdk.RGBA()
-        color.red = parent.highlight.color[0]
-        color.green = parent.highlight.color[1]
-        color.blue = parent.highlight.color[2]
-        color.alpha = parent.highlight.color[3]
-        color_button.set_rgba(color)
-        color_button.connect("color-set", self.on_color_changed, parent)
-        color_row.add_suffix(color_button)
-        appearance_group.add(color_row)
-        
-        inner_opacity_row = Adw.ActionRow(title="Inner Shape Opacity")
-        inner_opacity_adj = Gtk.Adjustment(
-            value=parent.highlight.inner_opacity, 
-            lower=0.1, 
-            upper=1.0, 
-            step_increment=0.1
-        )
-        inner_opacity_scale = Gtk.Scale(
-            adjustment=inner_opacity_adj, 
-            orientation=Gtk.Orientation.HORIZONTAL
-        )
-        inner_opacity_scale.set_hexpand(True)
-        inner_opacity_scale.set_draw_value(True)
-        inner_opacity_scale.set_value_pos(Gtk.PositionType.RIGHT)
-        inner_opacity_scale.connect("value-changed", self.on_inner_opacity_changed, parent)
-        inner_opacity_row.add_suffix(inner_opacity_scale)
-        appearance_group.add(inner_opacity_row)
-        
-        glow_size_row = Adw.ActionRow(title="Glow Size")
-        glow_size_adj = Gtk.Adjustment(
-            value=parent.highlight.glow_size, 
-            lower=0, 
-            upper=30, 
-            step_increment=1
-        )
-        glow_size_scale = Gtk.Scale(
-            adjustment=glow_size_adj, 
-            orientation=Gtk.Orientation.HORIZONTAL
-        )
-        glow_size_scale.set_hexpand(True)
-        glow_size_scale.set_draw_value(True)
-        glow_size_scale.set_value_pos(Gtk.PositionType.RIGHT)
-        glow_size_scale.connect("value-changed", self.on_glow_size_changed, parent)
-        glow_size_row.add_suffix(glow_size_scale)
-        appearance_group.add(glow_size_row)
-        
-        shape_row = Adw.ActionRow(title="Shape")
-        shape_dropdown = Gtk.DropDown.new_from_strings(["Rounded Square", "Circle"])
-        shape_dropdown.set_selected(0 if parent.highlight.shape == HighlightShape.ROUNDED_SQUARE else 1)
-        shape_dropdown.connect("notify::selected", self.on_shape_changed, parent)
-        shape_row.add_suffix(shape_dropdown)
-        appearance_group.add(shape_row)
-        
-        outer_stroke_row = Adw.ActionRow(title="Outer Stroke Width")
-        outer_stroke_adj = Gtk.Adjustment(
-            value=parent.highlight.border_width,
-            lower=1,
-            upper=20,
-            step_increment=1
-        )
-        outer_stroke_scale = Gtk.Scale(
-            adjustment=outer_stroke_adj,
-            orientation=Gtk.Orientation.HORIZONTAL
-        )
-        outer_stroke_scale.set_hexpand(True)
-        outer_stroke_scale.set_draw_value(True)
-        outer_stroke_scale.set_value_pos(Gtk.PositionType.RIGHT)
-        outer_stroke_scale.connect("value-changed", self.on_outer_stroke_changed, parent)
-        outer_stroke_row.add_suffix(outer_stroke_scale)
-        appearance_group.add(outer_stroke_row)
-        
-        inner_stroke_row = Adw.ActionRow(title="Inner Stroke Width")
-        inner_stroke_adj = Gtk.Adjustment(
-            value=parent.highlight.inner_stroke_width,
-            lower=0,
-            upper=20,
-            step_increment=1
-        )
-        inner_stroke_scale = Gtk.Scale(
-            adjustment=inner_stroke_adj,
-            orientation=Gtk.Orientation.HORIZONTAL
-        )
-        inner_stroke_scale.set_hexpand(True)
-        inner_stroke_scale.set_draw_value(True)
-        inner_stroke_scale.set_value_pos(Gtk.PositionType.RIGHT)
-        inner_stroke_scale.connect("value-changed", self.on_inner_stroke_changed, parent)
-        inner_stroke_row.add_suffix(inner_stroke_scale)
-        appearance_group.add(inner_stroke_row)
-        
-        # Make corner radius row sensitive only for rounded square
-        self.radius_row = radius_row  # Store reference to update sensitivity
-        self.update_radius_sensitivity(parent.highlight.shape)
-        
-        animation_row = Adw.ActionRow(title="Bend Animation")
-        animation_switch = Gtk.Switch()
-        animation_switch.set_active(parent.highlight.animation_enabled)
-        animation_switch.connect("notify::active", self.on_animation_toggled, parent)
-        animation_row.add_suffix(animation_switch)
-        appearance_group.add(animation_row)
-        
-        speed_row = Adw.ActionRow(title="Animation Speed")
-        speed_adj = Gtk.Adjustment(
-            value=parent.highlight.animation_speed,
-            lower=0.05,
-            upper=0.5,
-            step_increment=0.05
-        )
-        speed_scale = Gtk.Scale(
-            adjustment=speed_adj,
-            orientation=Gtk.Orientation.HORIZONTAL
-        )
-        speed_scale.set_hexpand(True)
-        speed_scale.set_draw_value(True)
-        speed_scale.set_value_pos(Gtk.PositionType.RIGHT)
-        speed_scale.connect("value-changed", self.on_speed_changed, parent)
-        speed_row.add_suffix(speed_scale)
-        appearance_group.add(speed_row)
-    
-    def on_size_changed(self, scale, parent):
-        parent.highlight.size = scale.get_value()
-        parent.save_settings()
-        
-    def on_radius_changed(self, scale, parent):
-        parent.highlight.corner_radius = scale.get_value()
-        parent.save_settings()
-        
-    def on_rotation_changed(self, scale, parent):
-        parent.highlight.rotation = scale.get_value()
-        parent.save_settings()
-        
-    def on_color_changed(self, button, parent):
-        color = button.get_rgba()
-        parent.highlight.color = (color.red, color.green, color.blue, color.alpha)
-        parent.save_settings()
-        
-    def on_inner_opacity_changed(self, scale, parent):
-        parent.highlight.inner_opacity = scale.get_value()
-        parent.save_settings()
-        
-    def on_glow_size_changed(self, scale, parent):
-        parent.highlight.glow_size = scale.get_value()
-        parent.save_settings()
-    
-    def on_shape_changed(self, dropdown, param, parent):
-        selected = dropdown.get_selected()
-        parent.highlight.shape = HighlightShape.ROUNDED_SQUARE if selected == 0 else HighlightShape.CIRCLE
-        self.update_radius_sensitivity(parent.highlight.shape)
-        parent.save_settings()
-    
-    def update_radius_sensitivity(self, shape):
-        self.radius_row.set_sensitive(shape == HighlightShape.ROUNDED_SQUARE)
-    
-    def on_outer_stroke_changed(self, scale, parent):
-        parent.highlight.border_width = scale.get_value()
-        parent.save_settings()
-    
-    def on_inner_stroke_changed(self, scale, parent):
-        parent.highlight.inner_stroke_width = scale.get_value()
-        parent.save_settings()
-    
-    def on_animation_toggled(self, switch, param, parent):
-        parent.highlight.animation_enabled = switch.get_active()
-        parent.save_settings()
-    
-    def on_speed_changed(self, scale, parent):
-        parent.highlight.animation_speed = scale.get_value()
-        parent.save_settings()
-
 class CursorProApp(Gtk.Application):
     def __init__(self):
         super().__init__(application_id=APP_ID)
+        self.preferences = None  # Built on first use, then reused
+        self.dbus_registration_id = 0
         
     def do_activate(self):
         win = CursorProWindow(self)
         win.present()
         
+    def do_dbus_register(self, connection, object_path):
+        if not Gtk.Application.do_dbus_register(self, connection, object_path):
+            return False
+        interface = Gio.DBusNodeInfo.new_for_xml(DBUS_XML).lookup_interface(DBUS_INTERFACE)
+        self.dbus_registration_id = connection.register_object(
+            object_path, interface, self.on_dbus_method_call, None, None
+        )
+        return True
+        
+    def do_dbus_unregister(self, connection, object_path):
+        if self.dbus_registration_id:
+            connection.unregister_object(self.dbus_registration_id)
+            self.dbus_registration_id = 0
+        Gtk.Application.do_dbus_unregister(self, connection, object_path)
+        
+    def on_dbus_method_call(self, connection, sender, object_path, interface_name, method_name,
+                            parameters, invocation):
+        win = next((win for win in self.get_windows() if isinstance(win, CursorProWindow)), None)
+        if win is None:
+            invocation.return_dbus_error(f"{DBUS_INTERFACE}.Error.NoWindow", "CursorGlow has no window open")
+            return
+        try:
+            if method_name == "ApplySettings":
+                # All or nothing, one bad or unknown key rejects the whole batch
+                settings = parameters.unpack()[0]
+                unknown = sorted(key for key in settings if key not in SETTINGS_BY_KEY)
+                if unknown:
+                    raise ValueError(f"unknown settings: {', '.join(unknown)}")
+                result = GLib.Variant("(as)", (win.apply_settings(validate_settings(settings)),))
+            elif method_name == "SwitchProfile":
+                result = GLib.Variant("(as)", (win.switch_profile(parameters.unpack()[0]),))
+            else:
+                stats = {key: GLib.Variant("t" if isinstance(value, int) else "d", value)
+                         for key, value in win.stats_summary().items()}
+                result = GLib.Variant("(a{sv})", (stats,))
+        except FileNotFoundError:
+            invocation.return_dbus_error(f"{DBUS_INTERFACE}.Error.UnknownProfile",
+                                         f"No profile named {parameters.unpack()[0]}")
+            return
+        except OSError as e:
+            # Unreadable profile (permissions, a directory...), every call must get a reply
+            invocation.return_dbus_error("org.freedesktop.DBus.Error.Failed", f"{e.strerror}: {e.filename}")
+            return
+        except ValueError as e:
+            invocation.return_dbus_error("org.freedesktop.DBus.Error.InvalidArgs", str(e))
+            return
+        invocation.return_value(result)
+        
     def do_startup(self):
         Gtk.Application.do_startup(self)
         
@@ -571,19 +678,58 @@ class CursorProApp(Gtk.Application):
         about_action.connect("activate", self.on_about)
         self.add_action(about_action)
         
+        # Hidden debugging actions, not in the menu
+        hud_action = Gio.SimpleAction.new("toggle-hud", None)
+        hud_action.connect("activate", self.on_toggle_hud)
+        self.add_action(hud_action)
+        
+        dump_action = Gio.SimpleAction.new("dump-stats", None)
+        dump_action.connect("activate", self.on_dump_stats)
+        self.add_action(dump_action)
+        
         # Add keyboard shortcuts
         self.set_accels_for_action("app.preferences", ["<Control>p"])
         self.set_accels_for_action("app.quit", ["<Control>q"])
+        self.set_accels_for_action("app.toggle-hud", ["<Control><Shift>d"])
+        self.set_accels_for_action("app.dump-stats", ["<Control><Shift>s"])
+        
+    def do_shutdown(self):
+        # Don't lose changes still waiting for the save debounce
+        for win in self.get_windows():
+            if isinstance(win, CursorProWindow):
+                win.settings_store.flush()
+                if win.pointer_source is not None:
+                    win.pointer_source.stop()
+                    win.extra_pointer_source.stop()
+                if win.recorder is not None:
+                    win.recorder.close()
+                win.sprite_worker.stop()
+                if win.atlas_writer is not None:
+                    win.atlas_writer.join()  # Don't leave a half-written atlas behind
+        Gtk.Application.do_shutdown(self)
         
     def on_quit(self, action, param):
         self.quit()
         
-    def on_preferences(self, action, param):
+    def on_toggle_hud(self, action, param):
+        win = self.get_active_window()
+        if isinstance(win, CursorProWindow):
+            win.toggle_hud()
+        
+    def on_dump_stats(self, action, param):
         win = self.get_active_window()
-        dialog = PreferencesDialog(win)
-        dialog.present()
+        if isinstance(win, CursorProWindow):
+            win.dump_stats()
+        
+    def on_preferences(self, action, param):
+        # Imported on first use so Adw isn't loaded at startup
+        from cursorglow_prefs import PreferencesDialog
+        if self.preferences is None:
+            self.preferences = PreferencesDialog(self.get_active_window())
+        self.preferences.present()
         
     def on_about(self, action, param):
+        from gi.repository import Adw
         win = self.get_active_window()
         about = Adw.AboutWindow(
             transient_for=win,
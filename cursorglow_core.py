@@ -0,0 +1,1455 @@
+import cairo
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from enum import Enum
+
+SPRITE_CACHE_SIZE = 64  # Max number of pre-rendered highlight sprites kept around
+PRESS_STEPS = 32  # Press animation is quantized to this many steps for the sprite cache
+PRESS_OFFSET = 10  # How far the rounded square slides sideways while a button is held
+MOTION_BUFFER_SIZE = 32  # Motion samples kept between frames
+VELOCITY_WINDOW = 0.05  # Seconds of motion history used to estimate cursor velocity
+MAX_PREDICTION = 0.05  # Never extrapolate the cursor further ahead than this (seconds)
+HISTOGRAM_BUCKETS = 96  # Four buckets per power of two, from 1 us up to ~16 s
+TRAIL_WIDTH = 0.25  # Motion trail stroke width, relative to the highlight size
+TRAIL_BANDS = 8  # Opacity steps of the motion trail fade, each one is stroked once
+ANIMATION_STEP = 1 / 240  # Fixed animation integrator timestep (seconds)
+MAX_ANIMATION_DELTA = 0.25  # Longer frame gaps are clamped so the integrator can't spiral
+SPRING_OMEGA = 8.0  # Spring angular frequency per unit of animation_speed
+MAX_POINTERS = 16  # Extra pointers and touch points highlighted at once, the least recent one is dropped
+POINTER_IDLE_TIMEOUT = 5.0  # Extra pointers without events for this long (seconds) are dropped
+SETTLE_EPSILON = 1e-3  # Channels closer than this to their target (and as slow) snap to it
+RIPPLE_POOL_SIZE = 32  # Hard cap on concurrent click ripples, the pool never grows
+RIPPLE_SPREAD = 1.5  # Ripples grow from the highlight radius to (1 + spread) times it
+RIPPLE_WIDTH = 2  # Ripple stroke width
+GOVERNOR_WINDOW = 60  # Frames per quality decision
+GOVERNOR_BUDGET = 0.25  # Share of the refresh interval a frame of ours may take (90th percentile)
+GOVERNOR_HEADROOM = 0.4  # Quality only steps back up while frames stay below this share of the budget
+GOVERNOR_RECOVER_WINDOWS = 3  # ...for this many windows in a row
+REDUCED_PRESS_STEPS = 8  # Press quantization from QUALITY_REDUCED on, fewer sprites to rasterize
+ATLAS_VERSION = 2  # Bump whenever render() output changes, atlases of older versions are then ignored
+ATLAS_MAGIC = b"CGLWATL1"
+ATLAS_HEADER = struct.Struct("<8s32sdIII")  # Magic, settings digest, scale, side, stride, sprite count
+ATLAS_ALIGN = 64  # Sprite pixel data starts at multiples of this in the file
+ATLAS_MAX_BYTES = 64 * 1024 * 1024  # Atlas cache size limit, least recently used files go first
+ATLAS_MAX_AGE = 30 * 24 * 3600  # Atlases unused for this long (seconds) are deleted
+ATLAS_TEMP_AGE = 3600  # Half-written atlases older than this (seconds) were abandoned, e.g. by a crash
+INPUT_LOG_MAGIC = b"CGLWREC1"  # First bytes of an input recording, the digit is the format version
+INPUT_EVENT = struct.Struct("<IBBff")  # Microseconds since the previous event, button (0 = motion), pressed, x, y
+
+class HighlightShape(Enum):
+    CIRCLE = "circle"
+    ROUNDED_SQUARE = "rounded_square"
+
+class AnimationCurve(Enum):
+    LINEAR = "linear"
+    EASE_OUT = "ease_out"
+    SPRING = "spring"
+
+class Renderer(Enum):
+    CAIRO = "cairo"  # Draw function, rasterized on the CPU
+    GSK = "gsk"  # Render nodes, composited by whatever GSK renderer is active
+
+# Quality tiers of the governor, each one keeps the savings of the ones before it
+QUALITY_FULL = 0
+QUALITY_REDUCED = 1  # Coarser press animation, so fewer sprite rasterizations
+QUALITY_STATIC = 2  # No animations, trail or ripples
+QUALITY_HALF_RATE = 3  # Every other frame clock tick is skipped
+QUALITY_TIERS = ("Full", "Reduced", "Static", "Half Rate")  # Display names
+POWER_SAVER_TIER = QUALITY_STATIC  # Best quality allowed on battery with power_saver on
+
+class Setting:
+    __slots__ = ("key", "type", "default", "lower", "upper", "step", "title", "render")
+    
+    def __init__(self, key, type, default, lower=None, upper=None, step=None, title=None, render=True):
+        self.key = key
+        self.type = type  # float, int, bool, tuple (RGBA color) or an Enum class
+        self.default = default
+        self.lower = lower
+        self.upper = upper
+        self.step = step
+        self.title = title  # Preferences row title, None keeps it out of the preferences window
+        self.render = render  # Changing it changes the rendered highlight pixels
+        
+    def validate(self, value):
+        # Coerce a loaded value to the schema type, raises ValueError if it can't be
+        if self.type is bool:
+            if not isinstance(value, bool):
+                raise ValueError(f"{self.key} must be true or false")
+            return value
+        if self.type is tuple:
+            if (not isinstance(value, (list, tuple)) or len(value) != 4 or
+                    not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in value)):
+                raise ValueError(f"{self.key} must be a list of 4 numbers")
+            return tuple(min(max(float(v), 0.0), 1.0) for v in value)
+        if issubclass(self.type, Enum):
+            return self.type(value.value if isinstance(value, Enum) else value)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or math.isnan(value):
+            raise ValueError(f"{self.key} must be a number")
+        value = float(min(max(value, self.lower), self.upper))
+        return int(round(value)) if self.type is int else value
+        
+    def to_json(self, value):
+        if self.type is tuple:
+            return list(value)
+        if issubclass(self.type, Enum):
+            return value.value
+        return value
+
+SETTINGS = (
+    Setting("size", float, 50.0, 10, 100, 1, "Size"),
+    Setting("corner_radius", float, 15.0, 0, 50, 1, "Corner Radius"),
+    Setting("rotation", float, 0.0, 0, 360, 1, "Rotation"),
+    Setting("color", tuple, (1.0, 1.0, 1.0, 0.8), title="Color"),
+    Setting("inner_opacity", float, 0.5, 0.1, 1.0, 0.1, "Inner Shape Opacity"),
+    Setting("glow_size", float, 10.0, 0, 30, 1, "Glow Size"),
+    Setting("glow_opacity", float, 0.3, 0.0, 1.0, 0.05, "Glow Opacity"),
+    Setting("shape", HighlightShape, HighlightShape.ROUNDED_SQUARE, title="Shape"),
+    Setting("border_width", float, 4.0, 1, 20, 1, "Outer Stroke Width"),
+    Setting("inner_stroke_width", float, 2.0, 0, 20, 1, "Inner Stroke Width"),
+    Setting("animation_enabled", bool, True, title="Bend Animation", render=False),
+    Setting("animation_speed", float, 5.0, 1.0, 20.0, 0.5, "Animation Speed", render=False),
+    Setting("animation_curve", AnimationCurve, AnimationCurve.SPRING, title="Animation Curve", render=False),
+    Setting("prediction_strength", float, 0.0, 0.0, 1.0, 0.05, "Cursor Prediction", render=False),
+    Setting("trail_enabled", bool, False, title="Motion Trail", render=False),
+    Setting("trail_length", float, 0.3, 0.05, 2.0, 0.05, "Trail Length", render=False),
+    Setting("trail_fade", float, 0.5, 0.0, 1.0, 0.05, "Trail Opacity", render=False),
+    Setting("trail_capacity", int, 64, 8, 512, 8, "Trail Points", render=False),
+    Setting("ripple_enabled", bool, True, title="Click Ripples", render=False),
+    Setting("ripple_lifetime", float, 0.4, 0.1, 2.0, 0.05, "Ripple Duration", render=False),
+    Setting("ripple_color", tuple, (1.0, 1.0, 1.0, 0.6), title="Ripple Color", render=False),
+    Setting("ripple_max", int, 8, 1, RIPPLE_POOL_SIZE, 1, "Max Ripples", render=False),
+    Setting("renderer", Renderer, Renderer.CAIRO, title="Renderer", render=False),
+    Setting("power_saver", bool, False, title="Power Saver on Battery", render=False),
+)
+SETTINGS_BY_KEY = {setting.key: setting for setting in SETTINGS}
+
+def validate_settings(settings):
+    # Validated copy of the known keys, raises ValueError if any of them is malformed
+    if not isinstance(settings, dict):
+        raise ValueError("settings must be a JSON object")
+    return {setting.key: setting.validate(settings[setting.key])
+            for setting in SETTINGS if setting.key in settings}
+
+def union_rect(a, b):
+    # Smallest (x, y, width, height) box containing both rectangles, either may be None
+    if a is None:
+        return b
+    if b is None:
+        return a
+    left = min(a[0], b[0])
+    top = min(a[1], b[1])
+    right = max(a[0] + a[2], b[0] + b[2])
+    bottom = max(a[1] + a[3], b[1] + b[3])
+    return (left, top, right - left, bottom - top)
+
+class AnimationEngine:
+    __slots__ = ("channels", "value", "velocity", "target", "origin", "progress", "curve", "speed", "accumulator")
+    
+    def __init__(self, channels):
+        # Channel state lives in parallel arrays and every channel is stepped together
+        self.channels = channels
+        self.value = array("d", bytes(8 * channels))
+        self.velocity = array("d", bytes(8 * channels))  # Spring only
+        self.target = array("d", bytes(8 * channels))
+        self.origin = array("d", bytes(8 * channels))  # Ease only, value when the target changed
+        self.progress = array("d", bytes(8 * channels))  # Ease only, 0..1
+        self.curve = AnimationCurve.SPRING
+        self.speed = 5.0
+        self.accumulator = 0.0
+        
+    def set_target(self, channel, target):
+        if self.target[channel] != target:
+            self.target[channel] = target
+            self.origin[channel] = self.value[channel]
+            self.progress[channel] = 0.0
+        
+    def jump(self, channel, value):
+        # Set a channel without animating
+        self.value[channel] = value
+        self.velocity[channel] = 0.0
+        self.origin[channel] = value
+        self.progress[channel] = 1.0
+        
+    def finish(self):
+        # Jump every channel to its target
+        for i in range(self.channels):
+            if self.value[i] != self.target[i] or self.velocity[i] != 0.0:
+                self.jump(i, self.target[i])
+        self.accumulator = 0.0
+        
+    def settled(self):
+        for i in range(self.channels):
+            if self.value[i] != self.target[i] or self.velocity[i] != 0.0:
+                return False
+        return True
+        
+    def advance(self, delta_time):
+        # Fixed timestep, the result doesn't depend on the frame rate
+        self.accumulator += min(max(delta_time, 0.0), MAX_ANIMATION_DELTA)
+        while self.accumulator >= ANIMATION_STEP:
+            self.accumulator -= ANIMATION_STEP
+            self.step(ANIMATION_STEP)
+        if self.settled():
+            self.accumulator = 0.0
+        
+    def step(self, dt):
+        value = self.value
+        target = self.target
+        curve = self.curve
+        for i in range(self.channels):
+            distance = target[i] - value[i]
+            if distance == 0.0 and self.velocity[i] == 0.0:
+                continue
+            
+            if curve == AnimationCurve.SPRING:
+                # Critically damped spring, semi-implicit Euler
+                omega = self.speed * SPRING_OMEGA
+                velocity = self.velocity[i] + (omega * omega * distance - 2 * omega * self.velocity[i]) * dt
+                self.velocity[i] = velocity
+                value[i] += velocity * dt
+                if abs(target[i] - value[i]) < SETTLE_EPSILON and abs(velocity) < SETTLE_EPSILON:
+                    value[i] = target[i]
+                    self.velocity[i] = 0.0
+            elif curve == AnimationCurve.EASE_OUT:
+                # Cubic ease out over 1 / speed seconds
+                progress = min(self.progress[i] + self.speed * dt, 1.0)
+                self.progress[i] = progress
+                eased = 1.0 - (1.0 - progress) ** 3
+                value[i] = self.origin[i] + (target[i] - self.origin[i]) * eased
+                if progress >= 1.0:
+                    value[i] = target[i]
+            else:
+                # Constant speed, in units per second
+                move = self.speed * dt
+                value[i] = target[i] if abs(distance) <= move else value[i] + math.copysign(move, distance)
+                self.velocity[i] = 0.0
+
+LEFT_PRESS = 0  # Animation channels of CursorHighlight
+RIGHT_PRESS = 1
+
+class CursorHighlight:
+    # One slot per setting plus the runtime state, every frame reads these
+    __slots__ = tuple(setting.key for setting in SETTINGS) + (
+        "version", "inner_padding", "press_steps", "animation", "last_time", "_sprite_cache", "_sprite_version",
+        "_sprite", "_sprite_squeeze", "_sprite_scale", "_extent", "_extent_version",
+        "atlas_dir", "_atlas", "_atlas_key", "sprite_worker", "_shown_version", "_shown_half", "_requested"
+    )
+    
+    def __init__(self):
+        # Everything in SETTINGS (size, color, shape, glow...) starts at its default
+        for setting in SETTINGS:
+            setattr(self, setting.key, setting.default)
+        self.version = 0  # Bumped whenever a setting that affects the rendered pixels changes
+        self.inner_padding = 4
+        self.press_steps = PRESS_STEPS  # Lowered by the quality governor
+        self.animation = AnimationEngine(2)  # Press progress of the left and right buttons
+        self.last_time = time.monotonic()  # Use monotonic time for animations
+        self._sprite_cache = OrderedDict()  # LRU of rendered sprites for _sprite_version
+        self._sprite_version = 0
+        self._sprite = None  # Sprite of the last frame, reused without a cache lookup while it still fits
+        self._sprite_squeeze = 1.0
+        self._sprite_scale = 1.0
+        self._extent = 0
+        self._extent_version = -1  # extent() is cached per version
+        self.atlas_dir = None  # Where sprite atlases are kept between runs, None to not use them
+        self._atlas = None  # SpriteAtlas for _atlas_key, None if there is none on disk
+        self._atlas_key = None  # (version, scale) the atlas was looked up for
+        self.sprite_worker = None  # SpriteWorker for new settings, None to render them in draw()
+        self._shown_version = -1  # Version _sprite was rendered for, older while the worker catches up
+        self._shown_half = 0  # extent() of _shown_version
+        self._requested = None  # (version, squeeze_factor, scale) last handed to the worker
+        
+    def set_setting(self, key, value):
+        # Validated single setting change, returns whether anything changed
+        setting = SETTINGS_BY_KEY[key]
+        value = setting.validate(value)
+        if getattr(self, key) == value:
+            return False
+        setattr(self, key, value)
+        if setting.render:
+            self.version += 1
+        return True
+        
+    def apply_settings(self, settings):
+        # Keys that are missing or fail validation keep their current value
+        changed = []
+        for setting in SETTINGS:
+            if setting.key not in settings:
+                continue
+            try:
+                if self.set_setting(setting.key, settings[setting.key]):
+                    changed.append(setting.key)
+            except ValueError:
+                pass
+        return changed
+        
+    def to_settings(self):
+        return {setting.key: setting.to_json(getattr(self, setting.key)) for setting in SETTINGS}
+        
+    @property
+    def left_press_amount(self):
+        return self.animation.value[LEFT_PRESS]
+    
+    @left_press_amount.setter
+    def left_press_amount(self, value):
+        self.animation.jump(LEFT_PRESS, value)
+    
+    @property
+    def right_press_amount(self):
+        return self.animation.value[RIGHT_PRESS]
+    
+    @right_press_amount.setter
+    def right_press_amount(self, value):
+        self.animation.jump(RIGHT_PRESS, value)
+    
+    @property
+    def left_press_target(self):
+        return self.animation.target[LEFT_PRESS]
+    
+    @left_press_target.setter
+    def left_press_target(self, target):
+        self.animation.set_target(LEFT_PRESS, target)
+    
+    @property
+    def right_press_target(self):
+        return self.animation.target[RIGHT_PRESS]
+    
+    @right_press_target.setter
+    def right_press_target(self, target):
+        self.animation.set_target(RIGHT_PRESS, target)
+    
+    def update_animations(self, current_time=None):
+        if current_time is None:
+            current_time = time.monotonic()
+        # last_time is None on the first frame after the render loop went idle
+        delta_time = current_time - self.last_time if self.last_time is not None else 0.0
+        self.last_time = current_time
+        
+        if not self.animation_enabled:
+            return
+        
+        self.animation.curve = self.animation_curve
+        self.animation.speed = self.animation_speed
+        self.animation.advance(delta_time)
+    
+    def is_settled(self):
+        # Nothing left to animate, the render loop may go idle
+        if not self.animation_enabled:
+            return True
+        return self.animation.settled()
+    
+    def press_transform(self):
+        # Squeeze factor (circle) and horizontal offset (rounded square) of the press animation
+        return self.transform_for(self.left_press_amount, self.right_press_amount)
+    
+    def transform_for(self, left_amount, right_amount):
+        # press_transform() for any press amounts, PointerSet uses it for its pointers
+        squeeze_factor = 1.0
+        offset = 0
+        if not self.animation_enabled:
+            return squeeze_factor, offset
+        
+        if self.shape == HighlightShape.CIRCLE:
+            #  squeeze effect
+            if left_amount > 0:
+                squeeze_factor = 1.0 - (self._quantize_press(left_amount) * 0.2)
+            elif right_amount > 0:
+                squeeze_factor = 1.0 - (self._quantize_press(right_amount) * 0.2)
+        else:
+            # For rounded square, apply translation effect
+            if left_amount > 0:
+                offset = left_amount * PRESS_OFFSET
+            elif right_amount > 0:
+                offset = -right_amount * PRESS_OFFSET
+        return squeeze_factor, offset
+    
+    def _quantize_press(self, amount):
+        return round(amount * self.press_steps) / self.press_steps
+    
+    def extent(self):
+        # Half the side of a square that holds the highlight at any rotation
+        if self._extent_version == self.version:
+            return self._extent
+        reach = self.size / 2 + self.border_width / 2 + 2 * int(self.glow_size)
+        if self.shape == HighlightShape.ROUNDED_SQUARE:
+            reach *= math.sqrt(2)
+        self._extent = math.ceil(reach) + 1
+        self._extent_version = self.version
+        return self._extent
+    
+    def bounds(self, x, y, offset=None):
+        # Integer (x, y, width, height) box touched by draw() at this position
+        half = self.extent()
+        if self._shown_version != self.version and self._sprite is not None:
+            half = max(half, self._shown_half)  # The previous settings' sprite is still up
+        if offset is None:
+            _, offset = self.press_transform()
+        left = math.floor(x + offset - half) - 1
+        top = math.floor(y - half) - 1
+        side = 2 * half + 3
+        return (left, top, side, side)
+    
+    def get_sprite(self, squeeze_factor=1.0, scale=1.0):
+        sprite = self._cached_sprite(squeeze_factor, scale)
+        if sprite is None:
+            sprite = self._render_sprite(squeeze_factor, scale)
+            self._store_sprite((squeeze_factor, scale), sprite)
+        return sprite
+    
+    def _cached_sprite(self, squeeze_factor, scale):
+        # The sprite from the cache or the atlas, None if it has to be rendered
+        if self._sprite_version != self.version:
+            self._sprite_cache.clear()
+            self._sprite_version = self.version
+        key = (squeeze_factor, scale)
+        sprite = self._sprite_cache.get(key)
+        if sprite is not None:
+            self._sprite_cache.move_to_end(key)
+            return sprite
+        
+        atlas = self._get_atlas(scale)
+        if atlas is not None:
+            sprite = atlas.sprites.get(squeeze_factor)
+            if sprite is not None:
+                self._store_sprite(key, sprite)
+        return sprite
+    
+    def _store_sprite(self, key, sprite):
+        self._sprite_cache[key] = sprite
+        if len(self._sprite_cache) > SPRITE_CACHE_SIZE:
+            self._sprite_cache.popitem(last=False)
+    
+    def add_sprite(self, version, squeeze_factor, scale, sprite):
+        # Hand over a sprite the worker rendered, False if the settings changed again meanwhile
+        if version != self.version:
+            return False
+        if self._sprite_version != version:
+            self._sprite_cache.clear()
+            self._sprite_version = version
+        self._store_sprite((squeeze_factor, scale), sprite)
+        return True
+    
+    def _render_sprite(self, squeeze_factor, scale):
+        half = self.extent()
+        pixels = math.ceil(2 * half * scale)
+        sprite = cairo.ImageSurface(cairo.FORMAT_ARGB32, pixels, pixels)
+        sprite.set_device_scale(scale, scale)
+        self.render(cairo.Context(sprite), half, half, squeeze_factor)
+        return sprite
+    
+    def press_squeezes(self):
+        # Every squeeze factor press_transform() can return, only the circle squeezes
+        if self.shape != HighlightShape.CIRCLE:
+            return [1.0]
+        return [1.0 - ((step / PRESS_STEPS) * 0.2) for step in range(PRESS_STEPS + 1)]
+    
+    def atlas_digest(self, scale):
+        # Identifies the rendered pixels: render settings, renderer version, scale and byte order
+        settings = {setting.key: setting.to_json(getattr(self, setting.key))
+                    for setting in SETTINGS if setting.render}
+        payload = json.dumps([ATLAS_VERSION, float(scale), sys.byteorder, self.inner_padding, settings], sort_keys=True)
+        return hashlib.sha256(payload.encode()).digest()
+    
+    def atlas_path(self, digest):
+        return os.path.join(self.atlas_dir, f"atlas-{digest.hex()[:32]}.bin")
+    
+    def _get_atlas(self, scale):
+        if self.atlas_dir is None:
+            return None
+        if self._atlas_key != (self.version, scale):
+            self._atlas_key = (self.version, scale)
+            digest = self.atlas_digest(scale)
+            self._atlas = SpriteAtlas.load(self.atlas_path(digest), digest)
+        return self._atlas
+    
+    def drawn_scale(self):
+        # Device scale the last frame's sprite was drawn at, None before the first one.
+        # Atlases are written for it, so they are found under the same scale.
+        return self._sprite_scale if self._sprite is not None else None
+    
+    def reload_atlas(self):
+        # Look for the atlas again on the next cache miss, after save_atlas() wrote one
+        self._atlas_key = None
+    
+    def draw(self, ctx, x, y):
+        squeeze_factor, offset = self.press_transform()
+        self.blit(ctx, x, y, squeeze_factor, offset, ctx.get_target().get_device_scale()[0])
+    
+    def blit(self, ctx, x, y, squeeze_factor, offset, scale):
+        sprite = self._sprite
+        if (sprite is None or squeeze_factor != self._sprite_squeeze or scale != self._sprite_scale or
+                self._shown_version != self.version):
+            sprite = self._update_sprite(squeeze_factor, scale)
+        
+        # Snap to device pixels so the sprite is blitted without resampling
+        half = self._shown_half
+        left = round((x + offset - half) * scale) / scale
+        top = round((y - half) * scale) / scale
+        ctx.set_source_surface(sprite, left, top)
+        ctx.paint()
+    
+    def _update_sprite(self, squeeze_factor, scale):
+        if self.sprite_worker is not None and self._sprite is not None and self._shown_version != self.version:
+            sprite = self._cached_sprite(squeeze_factor, scale)
+            if sprite is None:
+                # New settings: the worker renders them while the previous sprite stays up
+                request = (self.version, squeeze_factor, scale)
+                if self._requested != request:
+                    self._requested = request
+                    self.sprite_worker.submit(self.version, self.to_settings(), squeeze_factor, scale)
+                return self._sprite
+        else:
+            sprite = self.get_sprite(squeeze_factor, scale)
+        
+        self._sprite = sprite
+        self._sprite_squeeze = squeeze_factor
+        self._sprite_scale = scale
+        self._shown_version = self.version
+        self._shown_half = self.extent()
+        return sprite
+    
+    def render(self, ctx, x, y, squeeze_factor=1.0):
+        ctx.save()
+        
+        if squeeze_factor != 1.0:
+            ctx.translate(x, y)
+            ctx.scale(squeeze_factor, 1.0)
+            ctx.translate(-x, -y)
+        
+        ctx.translate(x, y)
+        ctx.rotate(math.radians(self.rotation))
+        ctx.translate(-x, -y)
+        
+        self._draw_glow(ctx, x, y)
+        
+        #  outer shape
+        ctx.set_source_rgba(*self.color)
+        ctx.set_line_width(self.border_width)
+        
+        half_size = self.size / 2
+        outer_x = x - half_size
+        outer_y = y - half_size
+        
+        radius = self.clamped_corner_radius()
+        if self.shape == HighlightShape.CIRCLE:
+            self._draw_circle(ctx, x, y, half_size)
+        else:
+            self._draw_rounded_rect(ctx, outer_x, outer_y, self.size, self.size, radius)
+        ctx.stroke()
+        
+        #  inner shape
+        inner_offset = self.border_width + self.inner_padding
+        inner_size = self.size - (inner_offset * 2)
+        inner_x = outer_x + inner_offset
+        inner_y = outer_y + inner_offset
+        inner_radius = max(0, radius - inner_offset)
+        
+        r, g, b, _ = self.color
+        ctx.set_source_rgba(r, g, b, self.inner_opacity)
+        ctx.set_line_width(self.inner_stroke_width)
+        if self.shape == HighlightShape.CIRCLE:
+            self._draw_circle(ctx, x, y, inner_size / 2)
+        else:
+            self._draw_rounded_rect(ctx, inner_x, inner_y, inner_size, inner_size, inner_radius)
+        ctx.stroke()
+        
+        ctx.restore()
+    
+    def _glow_stops(self):
+        # Falloff of the stacked glow strokes as (distance from the outline, alpha) pairs.
+        # Stroke i spans -border_width/2 .. 2i + border_width/2 at glow_opacity * i / glow_size,
+        # so the composited alpha only depends on the distance from the outline.
+        steps = range(int(self.glow_size), 0, -2)
+        if not steps or self.glow_opacity <= 0:
+            return []
+        
+        coverage = []
+        remaining = 1.0
+        for i in steps:
+            remaining *= 1.0 - self.glow_opacity * (i / self.glow_size)
+            coverage.append((2 * i + self.border_width / 2, 1.0 - remaining))
+        coverage.reverse()
+        
+        inner = -self.border_width / 2
+        stops = [(inner, coverage[0][1])]
+        previous = inner
+        for edge, alpha in coverage:
+            stops.append(((previous + edge) / 2, alpha))
+            previous = edge
+        stops.append((previous, 0.0))
+        return stops
+    
+    def _set_glow_stops(self, pattern, stops, base, first):
+        last = base + stops[-1][0]
+        r, g, b, _ = self.color
+        for distance, alpha in stops:
+            offset = (base + distance - first) / (last - first)
+            pattern.add_color_stop_rgba(max(offset, 0.0), r, g, b, alpha)
+        pattern.set_extend(cairo.EXTEND_NONE)
+    
+    def _draw_glow(self, ctx, x, y):
+        # One gradient fill per region instead of one stroke per glow step, so the
+        # cost no longer grows with glow_size
+        stops = self._glow_stops()
+        if not stops:
+            return
+        start = stops[0][0]
+        end = stops[-1][0]
+        half_size = self.size / 2
+        
+        ctx.save()
+        # Regions share edges exactly, antialiasing would leave seams between them
+        ctx.set_antialias(cairo.ANTIALIAS_NONE)
+        
+        if self.shape == HighlightShape.CIRCLE:
+            first = max(half_size + start, 0)
+            pattern = cairo.RadialGradient(x, y, first, x, y, half_size + end)
+            self._set_glow_stops(pattern, stops, half_size, first)
+            ctx.set_source(pattern)
+            self._draw_circle(ctx, x, y, half_size + end)
+            ctx.fill()
+            ctx.restore()
+            return
+        
+        # Rounded square: radial gradients around the corner arcs, linear ones along the sides
+        radius = self.clamped_corner_radius()
+        core = half_size - radius
+        reach = radius + end
+        for sx, sy in ((1, -1), (1, 1), (-1, 1), (-1, -1)):
+            cx = x + sx * core
+            cy = y + sy * core
+            first = max(radius + start, 0)
+            pattern = cairo.RadialGradient(cx, cy, first, cx, cy, reach)
+            self._set_glow_stops(pattern, stops, radius, first)
+            ctx.set_source(pattern)
+            ctx.rectangle(cx, cy, sx * reach, sy * reach)
+            ctx.fill()
+        
+        for nx, ny in ((1, 0), (0, 1), (-1, 0), (0, -1)):
+            first = half_size + start
+            pattern = cairo.LinearGradient(
+                x + nx * first, y + ny * first,
+                x + nx * (half_size + end), y + ny * (half_size + end)
+            )
+            self._set_glow_stops(pattern, stops, half_size, first)
+            ctx.set_source(pattern)
+            if nx:
+                ctx.rectangle(x + nx * core, y - core, nx * (half_size + end - core), 2 * core)
+            else:
+                ctx.rectangle(x - core, y + ny * core, 2 * core, ny * (half_size + end - core))
+            ctx.fill()
+        
+        ctx.restore()
+    
+    def clamped_corner_radius(self):
+        # corner_radius as drawn, at most half the size so the stroke and the glow agree
+        return min(max(self.corner_radius, 0), self.size / 2)
+    
+    def _draw_rounded_rect(self, ctx, x, y, width, height, radius):
+        ctx.new_sub_path()
+        ctx.arc(x + width - radius, y + radius, radius, -math.pi/2, 0)
+        ctx.arc(x + width - radius, y + height - radius, radius, 0, math.pi/2)
+        ctx.arc(x + radius, y + height - radius, radius, math.pi/2, math.pi)
+        ctx.arc(x + radius, y + radius, radius, math.pi, 3*math.pi/2)
+        ctx.close_path()
+    
+    def _draw_circle(self, ctx, x, y, radius):
+        ctx.new_sub_path()
+        ctx.arc(x, y, radius, 0, 2 * math.pi)
+        ctx.close_path()
+
+class SpriteWorker:
+    # Renders sprites for new settings on a background thread. Only the latest request counts:
+    # a queued one is replaced by the next, and one that gets superseded while rendering is dropped.
+    __slots__ = ("on_rendered", "_condition", "_job", "_generation", "_stopped", "_thread")
+    
+    def __init__(self, on_rendered):
+        # on_rendered(version, squeeze_factor, scale, sprite) is called on the worker thread
+        self.on_rendered = on_rendered
+        self._condition = threading.Condition()
+        self._job = None
+        self._generation = 0
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="sprite-worker", daemon=True)
+        self._thread.start()
+        
+    def submit(self, version, settings, squeeze_factor, scale):
+        with self._condition:
+            self._generation += 1
+            self._job = (self._generation, version, settings, squeeze_factor, scale)
+            self._condition.notify()
+            
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._job = None
+            self._condition.notify()
+        self._thread.join()
+        
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._job is None and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                generation, version, settings, squeeze_factor, scale = self._job
+                self._job = None
+            
+            # A private highlight, the caller keeps changing its own. Cairo drops the GIL
+            # while it rasterizes, so the main loop keeps running.
+            highlight = CursorHighlight()
+            highlight.apply_settings(settings)
+            sprite = highlight._render_sprite(squeeze_factor, scale)
+            sprite.flush()
+            
+            with self._condition:
+                if generation != self._generation or self._stopped:
+                    continue
+            self.on_rendered(version, squeeze_factor, scale, sprite)
+
+class SpriteAtlas:
+    __slots__ = ("sprites", "mapping")
+    
+    def __init__(self, sprites, mapping):
+        # Sprites by squeeze factor, their pixels live in the memory-mapped atlas file
+        self.sprites = sprites
+        self.mapping = mapping
+        
+    @classmethod
+    def load(cls, path, digest):
+        # The atlas at path, None if there is none. Files that don't match digest or are
+        # damaged are deleted so they get rebuilt.
+        try:
+            with open(path, "rb") as f:
+                # Copy-on-write mapping, cairo wants a writable buffer but never writes to sources
+                mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            _remove_quietly(path)
+            return None
+        
+        try:
+            magic, stored_digest, scale, side, stride, count = ATLAS_HEADER.unpack_from(mapping, 0)
+            table = ATLAS_HEADER.size
+            first = _align(table + 8 * count)
+            size = stride * side
+            if (magic != ATLAS_MAGIC or stored_digest != digest or not count or
+                    stride < 4 * side or len(mapping) != first + count * _align(size)):
+                raise ValueError("atlas doesn't match")
+            view = memoryview(mapping)
+            sprites = {}
+            for i, (squeeze_factor,) in enumerate(struct.iter_unpack("<d", mapping[table:table + 8 * count])):
+                start = first + i * _align(size)
+                sprite = cairo.ImageSurface.create_for_data(
+                    view[start:start + size], cairo.FORMAT_ARGB32, side, side, stride
+                )
+                sprite.set_device_scale(scale, scale)
+                sprites[squeeze_factor] = sprite
+        except (ValueError, struct.error, cairo.Error):
+            _remove_quietly(path)
+            return None
+        
+        try:
+            os.utime(path)  # Recently used, evict_atlases() goes by modification time
+        except OSError:
+            pass
+        return cls(sprites, mapping)
+        
+    @staticmethod
+    def write(path, digest, scale, sprites):
+        # Store (squeeze factor, surface) pairs of equally sized ARGB32 surfaces
+        first = sprites[0][1]
+        side = first.get_width()
+        stride = first.get_stride()
+        size = stride * side
+        table = ATLAS_HEADER.size
+        fd, tmp_path = tempfile.mkstemp(prefix=".atlas-", suffix=".tmp", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(ATLAS_HEADER.pack(ATLAS_MAGIC, digest, scale, side, stride, len(sprites)))
+                for squeeze_factor, _ in sprites:
+                    f.write(struct.pack("<d", squeeze_factor))
+                f.write(bytes(_align(table + 8 * len(sprites)) - table - 8 * len(sprites)))
+                for _, sprite in sprites:
+                    sprite.flush()
+                    f.write(sprite.get_data())
+                    f.write(bytes(_align(size) - size))
+            os.replace(tmp_path, path)
+        except BaseException:
+            _remove_quietly(tmp_path)
+            raise
+
+def save_atlas(directory, settings, scale):
+    # Render every press step of settings into an atlas in directory, returns False if it
+    # already exists. Works on its own highlight, so it can run on a background thread.
+    highlight = CursorHighlight()
+    highlight.apply_settings(settings)
+    highlight.atlas_dir = directory
+    digest = highlight.atlas_digest(scale)
+    path = highlight.atlas_path(digest)
+    if os.path.exists(path):
+        return False
+    sprites = [(squeeze_factor, highlight._render_sprite(squeeze_factor, scale))
+               for squeeze_factor in highlight.press_squeezes()]
+    SpriteAtlas.write(path, digest, scale, sprites)
+    evict_atlases(directory, path)
+    return True
+
+def evict_atlases(directory, keep=None):
+    # Drop atlases unused for ATLAS_MAX_AGE, then the least recently used ones until the
+    # rest fits in ATLAS_MAX_BYTES. keep is never deleted. Temporary files of writes that
+    # never finished go too.
+    now = time.time()
+    atlases = []
+    for entry in os.scandir(directory):
+        temporary = entry.name.startswith(".atlas-") and entry.name.endswith(".tmp")
+        if not (temporary or entry.name.startswith("atlas-") and entry.name.endswith(".bin")):
+            continue
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        if temporary:
+            if now - stat.st_mtime > ATLAS_TEMP_AGE:
+                _remove_quietly(entry.path)
+        elif entry.path != keep and now - stat.st_mtime > ATLAS_MAX_AGE:
+            _remove_quietly(entry.path)
+        else:
+            atlases.append((stat.st_mtime, stat.st_size, entry.path))
+    
+    atlases.sort(reverse=True)
+    total = 0
+    for mtime, size, path in atlases:
+        total += size
+        if total > ATLAS_MAX_BYTES and path != keep:
+            _remove_quietly(path)
+
+def _align(offset):
+    return -(-offset // ATLAS_ALIGN) * ATLAS_ALIGN
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+class MotionBuffer:
+    __slots__ = ("capacity", "times", "xs", "ys", "head", "count", "pending")
+    
+    def __init__(self, capacity=MOTION_BUFFER_SIZE):
+        # Timestamped ring buffer, filled by motion events and read once per frame
+        self.capacity = capacity
+        self.times = array("d", bytes(8 * capacity))
+        self.xs = array("d", bytes(8 * capacity))
+        self.ys = array("d", bytes(8 * capacity))
+        self.head = 0  # Index the next sample is written to
+        self.count = 0
+        self.pending = False  # Samples arrived since the last frame read the buffer
+        
+    def push(self, t, x, y):
+        i = self.head
+        self.times[i] = t
+        self.xs[i] = x
+        self.ys[i] = y
+        self.head = (i + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+        self.pending = True
+        
+    def latest_time(self):
+        return self.times[(self.head - 1) % self.capacity]
+        
+    def is_moving(self, now):
+        return self.count > 0 and now - self.times[(self.head - 1) % self.capacity] <= VELOCITY_WINDOW
+        
+    def predict(self, target_time, strength):
+        # Latest position, extrapolated with the recent velocity towards target_time
+        last = (self.head - 1) % self.capacity
+        t = self.times[last]
+        x = self.xs[last]
+        y = self.ys[last]
+        if strength <= 0 or self.count < 2 or target_time - t > VELOCITY_WINDOW:
+            return x, y
+        
+        oldest = last
+        for _ in range(self.count - 1):
+            previous = (oldest - 1) % self.capacity
+            if t - self.times[previous] > VELOCITY_WINDOW:
+                break
+            oldest = previous
+        span = t - self.times[oldest]
+        if span <= 0:
+            return x, y
+        
+        lead = min(max(target_time - t, 0.0), MAX_PREDICTION) * strength
+        return (x + (x - self.xs[oldest]) / span * lead,
+                y + (y - self.ys[oldest]) / span * lead)
+
+class MotionTrail:
+    __slots__ = ("capacity", "times", "xs", "ys", "head", "count")
+    
+    def __init__(self, capacity):
+        self.resize(capacity)
+        
+    def resize(self, capacity):
+        # The only place the trail allocates, called when the capacity setting changes
+        self.capacity = capacity
+        self.times = array("d", bytes(8 * capacity))
+        self.xs = array("d", bytes(8 * capacity))
+        self.ys = array("d", bytes(8 * capacity))
+        self.head = 0  # Index the next point is written to
+        self.count = 0
+        
+    def push(self, t, x, y):
+        if self.count:
+            last = (self.head - 1) % self.capacity
+            if self.xs[last] == x and self.ys[last] == y:
+                return
+        i = self.head
+        self.times[i] = t
+        self.xs[i] = x
+        self.ys[i] = y
+        self.head = (i + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+        
+    def expire(self, now, length):
+        # Drop points older than length seconds from the tail
+        while self.count:
+            oldest = (self.head - self.count) % self.capacity
+            if now - self.times[oldest] <= length:
+                break
+            self.count -= 1
+        
+    def bounds(self, width):
+        if self.count < 2:
+            return None
+        oldest = (self.head - self.count) % self.capacity
+        left = right = self.xs[oldest]
+        top = bottom = self.ys[oldest]
+        for k in range(1, self.count):
+            i = (oldest + k) % self.capacity
+            left = min(left, self.xs[i])
+            right = max(right, self.xs[i])
+            top = min(top, self.ys[i])
+            bottom = max(bottom, self.ys[i])
+        pad = width / 2 + 1
+        return (math.floor(left - pad), math.floor(top - pad),
+                math.ceil(right - left + 2 * pad) + 1, math.ceil(bottom - top + 2 * pad) + 1)
+        
+    def draw(self, ctx, color, opacity, width):
+        # Faded by age from tail to head in TRAIL_BANDS steps. Points are in time order, so
+        # each band is one run of segments and the trail takes at most TRAIL_BANDS strokes.
+        if self.count < 2:
+            return
+        oldest = (self.head - self.count) % self.capacity
+        newest = (self.head - 1) % self.capacity
+        start = self.times[oldest]
+        span = self.times[newest] - start
+        r, g, b, a = color
+        alpha = a * opacity / TRAIL_BANDS
+        ctx.save()
+        ctx.set_line_width(width)
+        # Butt caps: round ones of neighbouring bands would overlap at the shared point and
+        # leave brighter beads along a translucent trail
+        ctx.set_line_cap(cairo.LINE_CAP_BUTT)
+        ctx.set_line_join(cairo.LINE_JOIN_ROUND)
+        ctx.move_to(self.xs[oldest], self.ys[oldest])
+        
+        band = 0
+        previous = oldest
+        for k in range(1, self.count):
+            i = (oldest + k) % self.capacity
+            # A segment's age is that of its midpoint
+            if span > 0:
+                age = ((self.times[previous] + self.times[i]) / 2 - start) / span
+            else:
+                age = (k - 0.5) / (self.count - 1)
+            segment_band = min(int(age * TRAIL_BANDS), TRAIL_BANDS - 1)
+            if segment_band != band:
+                ctx.set_source_rgba(r, g, b, alpha * (band + 0.5))
+                ctx.stroke()
+                ctx.move_to(self.xs[previous], self.ys[previous])
+                band = segment_band
+            ctx.line_to(self.xs[i], self.ys[i])
+            previous = i
+        ctx.set_source_rgba(r, g, b, alpha * (band + 0.5))
+        ctx.stroke()
+        ctx.restore()
+
+class RipplePool:
+    __slots__ = ("capacity", "xs", "ys", "starts", "count", "now")
+    
+    def __init__(self, capacity=RIPPLE_POOL_SIZE):
+        # Preallocated slots, a slot is free while its start time is negative
+        self.capacity = capacity
+        self.xs = array("d", bytes(8 * capacity))
+        self.ys = array("d", bytes(8 * capacity))
+        self.starts = array("d", [-1.0]) * capacity
+        self.count = 0
+        self.now = 0.0
+        
+    def spawn(self, now, x, y, limit):
+        # Take a free slot, or recycle the oldest ripple once `limit` are running
+        slot = -1
+        oldest = -1
+        for i in range(self.capacity):
+            if self.starts[i] < 0:
+                if slot < 0:
+                    slot = i
+            elif oldest < 0 or self.starts[i] < self.starts[oldest]:
+                oldest = i
+        if slot < 0 or self.count >= limit:
+            slot = oldest
+        else:
+            self.count += 1
+        self.xs[slot] = x
+        self.ys[slot] = y
+        self.starts[slot] = now
+        
+    def clear(self):
+        for i in range(self.capacity):
+            self.starts[i] = -1.0
+        self.count = 0
+        
+    def update(self, now, lifetime):
+        self.now = now
+        for i in range(self.capacity):
+            if self.starts[i] >= 0 and now - self.starts[i] >= lifetime:
+                self.starts[i] = -1.0
+                self.count -= 1
+        
+    def bounds(self, radius):
+        # Box around every active ripple at its largest radius
+        rect = None
+        reach = math.ceil(radius * (1 + RIPPLE_SPREAD) + RIPPLE_WIDTH) + 1
+        for i in range(self.capacity):
+            if self.starts[i] >= 0:
+                rect = union_rect(rect, (math.floor(self.xs[i]) - reach, math.floor(self.ys[i]) - reach,
+                                         2 * reach + 1, 2 * reach + 1))
+        return rect
+        
+    def draw(self, ctx, color, radius, lifetime):
+        r, g, b, a = color
+        ctx.save()
+        ctx.set_line_width(RIPPLE_WIDTH)
+        for i in range(self.capacity):
+            if self.starts[i] < 0:
+                continue
+            progress = min(max((self.now - self.starts[i]) / lifetime, 0.0), 1.0)
+            eased = 1.0 - (1.0 - progress) ** 2
+            ctx.new_sub_path()
+            ctx.arc(self.xs[i], self.ys[i], radius * (1 + RIPPLE_SPREAD * eased), 0, 2 * math.pi)
+            ctx.set_source_rgba(r, g, b, a * (1.0 - progress))
+            ctx.stroke()
+        ctx.restore()
+
+class PointerSet:
+    __slots__ = ("capacity", "keys", "slots", "xs", "ys", "seen", "count", "animation", "last_time")
+    
+    def __init__(self, capacity=MAX_POINTERS):
+        # Extra highlights (other X11 master pointers, touch points) in parallel arrays, drawn
+        # with the main highlight's sprites. Slot i animates on channels 2i (left) and 2i + 1 (right).
+        self.capacity = capacity
+        self.keys = [None] * capacity  # Device or touch sequence per slot, None while free
+        self.slots = {}  # Key to slot
+        self.xs = array("d", bytes(8 * capacity))
+        self.ys = array("d", bytes(8 * capacity))
+        self.seen = array("d", bytes(8 * capacity))  # Time of the last event per slot
+        self.count = 0
+        self.animation = AnimationEngine(2 * capacity)
+        self.last_time = None
+        
+    def slot(self, key, t):
+        slot = self.slots.get(key)
+        if slot is None:
+            if self.count < self.capacity:
+                slot = self.keys.index(None)
+                self.count += 1
+            else:
+                slot = min(range(self.capacity), key=self.seen.__getitem__)
+                del self.slots[self.keys[slot]]
+            self.keys[slot] = key
+            self.slots[key] = slot
+            for channel in (2 * slot, 2 * slot + 1):
+                self.animation.set_target(channel, 0.0)
+                self.animation.jump(channel, 0.0)
+        self.seen[slot] = t
+        return slot
+        
+    def move(self, key, t, x, y):
+        slot = self.slot(key, t)
+        self.xs[slot] = x
+        self.ys[slot] = y
+        
+    def button(self, key, t, button, pressed):
+        slot = self.slot(key, t)
+        if button == 1:
+            self.animation.set_target(2 * slot, 1.0 if pressed else 0.0)
+        elif button == 3:
+            self.animation.set_target(2 * slot + 1, 1.0 if pressed else 0.0)
+        
+    def remove(self, key):
+        slot = self.slots.pop(key, None)
+        if slot is not None:
+            self.keys[slot] = None
+            self.count -= 1
+        
+    def update(self, now, highlight, static):
+        # Animates every pointer in one pass and drops idle ones, returns True while animating
+        delta_time = now - self.last_time if self.last_time is not None else 0.0
+        self.last_time = now
+        if static or not highlight.animation_enabled:
+            self.animation.finish()
+        else:
+            self.animation.curve = highlight.animation_curve
+            self.animation.speed = highlight.animation_speed
+            self.animation.advance(delta_time)
+        
+        target = self.animation.target
+        for slot in range(self.capacity):
+            key = self.keys[slot]
+            if (key is not None and now - self.seen[slot] > POINTER_IDLE_TIMEOUT and
+                    not target[2 * slot] and not target[2 * slot + 1]):
+                self.remove(key)
+        return not self.animation.settled()
+        
+    def next_expiry(self):
+        # When the next idle pointer is due to be dropped, None without pointers
+        if not self.count:
+            return None
+        return min(self.seen[slot] for slot in range(self.capacity)
+                   if self.keys[slot] is not None) + POINTER_IDLE_TIMEOUT
+        
+    def transforms(self, highlight):
+        # (x, y, squeeze_factor, offset) of every pointer
+        value = self.animation.value
+        for slot in range(self.capacity):
+            if self.keys[slot] is not None:
+                squeeze_factor, offset = highlight.transform_for(value[2 * slot], value[2 * slot + 1])
+                yield self.xs[slot], self.ys[slot], squeeze_factor, offset
+        
+    def bounds(self, highlight):
+        rect = None
+        for x, y, _, offset in self.transforms(highlight):
+            rect = union_rect(rect, highlight.bounds(x, y, offset))
+        return rect
+        
+    def draw(self, ctx, highlight):
+        # One pass for all pointers, the device scale is looked up once and sprites are shared
+        if not self.count:
+            return
+        scale = ctx.get_target().get_device_scale()[0]
+        value = self.animation.value
+        for slot in range(self.capacity):
+            if self.keys[slot] is not None:
+                squeeze_factor, offset = highlight.transform_for(value[2 * slot], value[2 * slot + 1])
+                highlight.blit(ctx, self.xs[slot], self.ys[slot], squeeze_factor, offset, scale)
+
+class Scene:
+    __slots__ = ("highlight", "cursor_x", "cursor_y", "motion", "trail", "ripples", "pointers", "stats", "quality")
+    
+    def __init__(self, highlight=None):
+        # Everything between pointer input and pixels, with no GTK in it, so the window and
+        # offscreen replays (benchmark.py --replay) run the same frame pipeline
+        self.highlight = highlight if highlight is not None else CursorHighlight()
+        self.cursor_x = 0
+        self.cursor_y = 0
+        self.motion = MotionBuffer()
+        self.trail = MotionTrail(self.highlight.trail_capacity)
+        self.ripples = RipplePool()
+        self.stats = None  # FrameStats, update_animations is timed while set
+        self.quality = QUALITY_FULL  # Tier picked by a QualityGovernor, see set_quality()
+        self.pointers = PointerSet()
+        
+    def set_quality(self, tier):
+        self.quality = tier
+        self.highlight.press_steps = REDUCED_PRESS_STEPS if tier >= QUALITY_REDUCED else PRESS_STEPS
+        if tier >= QUALITY_STATIC:
+            self.trail.count = 0
+            self.ripples.clear()
+        
+    def motion_event(self, t, x, y):
+        # Only record the sample, the next update() consumes everything that arrived
+        self.motion.push(t, x, y)
+        
+    def button_event(self, t, button, pressed):
+        if pressed and self.highlight.ripple_enabled and self.quality < QUALITY_STATIC:
+            self.ripples.spawn(t, self.cursor_x, self.cursor_y, self.highlight.ripple_max)
+        target = 1.0 if pressed else 0.0
+        if button == 1:  # Left click
+            self.highlight.left_press_target = target
+        elif button == 3:  # Right click
+            self.highlight.right_press_target = target
+        
+    def pointer_event(self, t, key, kind, x, y, button=0):
+        # Extra pointers and touch points, kind is "motion", "press", "release" or "end"
+        if kind == "end":
+            self.pointers.remove(key)
+            return
+        self.pointers.move(key, t, x, y)
+        if kind == "motion":
+            return
+        pressed = kind == "press"
+        if pressed and self.highlight.ripple_enabled and self.quality < QUALITY_STATIC:
+            self.ripples.spawn(t, x, y, self.highlight.ripple_max)
+        self.pointers.button(key, t, button, pressed)
+        
+    def update(self, now, presentation_time):
+        # Advance one frame, returns False once there is nothing left to animate
+        highlight = self.highlight
+        if self.motion.count:
+            # Aim for where the cursor will be when this frame reaches the screen
+            self.cursor_x, self.cursor_y = self.motion.predict(presentation_time, highlight.prediction_strength)
+            self.motion.pending = False
+        
+        static = self.quality >= QUALITY_STATIC
+        if highlight.trail_enabled and not static:
+            if self.trail.capacity != highlight.trail_capacity:
+                self.trail.resize(highlight.trail_capacity)
+            if self.motion.count:
+                self.trail.push(now, self.cursor_x, self.cursor_y)
+            self.trail.expire(now, highlight.trail_length)
+        elif self.trail.count:
+            self.trail.count = 0
+        if self.ripples.count:
+            self.ripples.update(now, highlight.ripple_lifetime)
+        
+        if static:
+            highlight.animation.finish()
+        if self.stats is not None:
+            start = time.perf_counter()
+            highlight.update_animations(now)
+            self.stats.update.record(time.perf_counter() - start)
+        else:
+            highlight.update_animations(now)
+        
+        pointers_moving = self.pointers.count > 0 and self.pointers.update(now, highlight, static)
+        
+        predicting = highlight.prediction_strength > 0 and self.motion.is_moving(now)
+        return not (highlight.is_settled() and not predicting and not pointers_moving and
+                    not self.trail.count and not self.ripples.count)
+        
+    def effects_bounds(self):
+        # Trail and ripples, drawn under the highlight
+        rect = None
+        if self.trail.count:
+            rect = self.trail.bounds(self.highlight.size * TRAIL_WIDTH)
+        if self.ripples.count:
+            rect = union_rect(rect, self.ripples.bounds(self.highlight.size / 2))
+        return rect
+        
+    def draw_effects(self, ctx):
+        if self.trail.count:
+            self.trail.draw(ctx, self.highlight.color, self.highlight.trail_fade,
+                            self.highlight.size * TRAIL_WIDTH)
+        if self.ripples.count:
+            self.ripples.draw(ctx, self.highlight.ripple_color, self.highlight.size / 2,
+                              self.highlight.ripple_lifetime)
+        
+    def bounds(self):
+        # Area draw() paints: the highlight, the extra pointers and the effects
+        rect = union_rect(self.highlight.bounds(self.cursor_x, self.cursor_y), self.effects_bounds())
+        if self.pointers.count:
+            rect = union_rect(rect, self.pointers.bounds(self.highlight))
+        return rect
+        
+    def draw(self, ctx):
+        # Paint everything, ctx must be blank within bounds(). The window hands it a fresh
+        # cairo node of exactly that size, so the cost follows the highlight, not the window.
+        self.draw_effects(ctx)
+        self.pointers.draw(ctx, self.highlight)
+        self.highlight.draw(ctx, self.cursor_x, self.cursor_y)
+
+class QualityGovernor:
+    __slots__ = ("tier", "floor", "times", "count", "calm")
+    
+    def __init__(self):
+        # Watches frame times against the refresh interval and picks a QUALITY_* tier
+        self.tier = QUALITY_FULL
+        self.floor = QUALITY_FULL  # Best tier currently allowed, raised by the power saver
+        self.times = array("d", bytes(8 * GOVERNOR_WINDOW))
+        self.count = 0
+        self.calm = 0  # Windows in a row with plenty of headroom
+        
+    def record(self, seconds, refresh_interval):
+        # Returns True when the tier changed
+        self.times[self.count] = seconds
+        self.count += 1
+        if self.count < GOVERNOR_WINDOW:
+            return False
+        self.count = 0
+        if not refresh_interval:
+            return False
+        
+        # Step down right away, but only step up again after several calm windows
+        budget = refresh_interval * GOVERNOR_BUDGET
+        slow = sorted(self.times)[int(GOVERNOR_WINDOW * 0.9)]
+        tier = self.tier
+        if slow > budget:
+            tier = min(tier + 1, QUALITY_HALF_RATE)
+            self.calm = 0
+        elif slow < budget * GOVERNOR_HEADROOM:
+            self.calm += 1
+            if self.calm >= GOVERNOR_RECOVER_WINDOWS:
+                tier = max(tier - 1, QUALITY_FULL)
+                self.calm = 0
+        else:
+            self.calm = 0
+        return self.set_tier(tier)
+        
+    def set_floor(self, floor):
+        self.floor = floor
+        return self.set_tier(self.tier)
+        
+    def set_tier(self, tier):
+        tier = max(tier, self.floor)
+        if tier == self.tier:
+            return False
+        self.tier = tier
+        return True
+
+class InputRecorder:
+    def __init__(self, path):
+        # Appends pointer events to a binary log that benchmark.py --replay plays back
+        self.file = open(path, "wb")
+        self.file.write(INPUT_LOG_MAGIC)
+        self.last_time = None
+        
+    def motion(self, t, x, y):
+        self._write(t, 0, False, x, y)
+        
+    def button(self, t, button, pressed, x, y):
+        self._write(t, button, pressed, x, y)
+        
+    def _write(self, t, button, pressed, x, y):
+        delta = 0 if self.last_time is None else round((t - self.last_time) * 1e6)
+        self.last_time = t
+        self.file.write(INPUT_EVENT.pack(min(max(delta, 0), 0xFFFFFFFF), button, pressed, x, y))
+        
+    def close(self):
+        self.file.close()
+
+def read_input_log(path):
+    # (seconds since the first event, button, pressed, x, y) for every recorded event,
+    # button 0 is a motion event. Raises ValueError for files that aren't input logs.
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(INPUT_LOG_MAGIC):
+        raise ValueError(f"{path} is not a cursorglow input recording")
+    events = []
+    t = 0.0
+    end = len(data) - (len(data) - len(INPUT_LOG_MAGIC)) % INPUT_EVENT.size  # Drop a torn last event
+    for delta, button, pressed, x, y in INPUT_EVENT.iter_unpack(data[len(INPUT_LOG_MAGIC):end]):
+        t += delta / 1e6
+        events.append((t, button, bool(pressed), x, y))
+    return events
+
+class Histogram:
+    __slots__ = ("buckets", "count", "total", "max")
+    
+    def __init__(self):
+        # Fixed log-scale buckets, recording never allocates or grows
+        self.buckets = array("Q", bytes(8 * HISTOGRAM_BUCKETS))
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        
+    def record(self, seconds):
+        us = seconds * 1e6
+        bucket = int(math.log2(us) * 4) + 1 if us >= 1 else 0
+        self.buckets[min(bucket, HISTOGRAM_BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        
+    def upper_bound(self, bucket):
+        # Upper edge of a bucket in seconds
+        return 2 ** (bucket / 4) / 1e6
+        
+    def percentile(self, fraction):
+        if not self.count:
+            return 0.0
+        wanted = fraction * self.count
+        seen = 0
+        for bucket, n in enumerate(self.buckets):
+            seen += n
+            if seen >= wanted:
+                return min(self.upper_bound(bucket), self.max)
+        return self.max
+        
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "mean_us": self.total / self.count * 1e6 if self.count else 0.0,
+            "max_us": self.max * 1e6,
+            "p50_us": self.percentile(0.5) * 1e6,
+            "p90_us": self.percentile(0.9) * 1e6,
+            "p99_us": self.percentile(0.99) * 1e6,
+            "buckets": [
+                [self.upper_bound(bucket) * 1e6, n]
+                for bucket, n in enumerate(self.buckets) if n
+            ],
+        }
+
+class FrameStats:
+    __slots__ = ("update", "draw", "interval", "latency", "frames", "missed", "last_frame_time")
+    
+    def __init__(self):
+        self.update = Histogram()  # Time spent in update_animations
+        self.draw = Histogram()  # Time spent in the draw function
+        self.interval = Histogram()  # Time between frame clock ticks
+        self.latency = Histogram()  # Motion event to expected presentation
+        self.frames = 0
+        self.missed = 0
+        self.last_frame_time = None  # None right after the render loop woke up
+        
+    def tick(self, frame_time, refresh_interval):
+        self.frames += 1
+        if self.last_frame_time is not None:
+            interval = frame_time - self.last_frame_time
+            self.interval.record(interval)
+            if refresh_interval and interval > 1.5 * refresh_interval:
+                self.missed += 1
+        self.last_frame_time = frame_time
+        
+    def as_dict(self):
+        return {
+            "frames": self.frames,
+            "missed_frames": self.missed,
+            "update_animations": self.update.as_dict(),
+            "draw": self.draw.as_dict(),
+            "tick_interval": self.interval.as_dict(),
+            "motion_to_present": self.latency.as_dict(),
+        }
+        
+    def summary(self):
+        # Headline numbers only, flat, for the D-Bus GetStats call
+        summary = {"frames": self.frames, "missed_frames": self.missed}
+        for name, histogram in (("update", self.update), ("draw", self.draw),
+                                ("tick_interval", self.interval), ("motion_to_present", self.latency)):
+            summary[f"{name}_p50_us"] = histogram.percentile(0.5) * 1e6
+            summary[f"{name}_p99_us"] = histogram.percentile(0.99) * 1e6
+        return summary
+        
+    def hud_lines(self):
+        interval = self.interval.percentile(0.5)
+        return [
+            f"{1 / interval if interval else 0:5.0f} fps   {self.frames} frames   {self.missed} missed",
+            f"update  p50 {self.update.percentile(0.5) * 1e6:7.0f} us  p99 {self.update.percentile(0.99) * 1e6:7.0f} us",
+            f"draw    p50 {self.draw.percentile(0.5) * 1e6:7.0f} us  p99 {self.draw.percentile(0.99) * 1e6:7.0f} us",
+            f"latency p50 {self.latency.percentile(0.5) * 1e3:7.1f} ms  p99 {self.latency.percentile(0.99) * 1e3:7.1f} ms",
+        ]
@@ -0,0 +1,78 @@
+import gi
+gi.require_version('Gtk', '4.0')
+gi.require_version('Gdk', '4.0')
+gi.require_version('Gsk', '4.0')
+gi.require_version('Graphene', '1.0')
+from gi.repository import Gtk, Gdk, Gsk, Graphene
+
+from cursorglow_core import HighlightShape
+
+class HighlightView(Gtk.Widget):
+    # The overlay's drawing surface for both renderers, the window fills in the snapshot.
+    # Unlike a DrawingArea it doesn't paint a cairo node the size of the whole widget.
+    def __init__(self, window):
+        super().__init__()
+        self.window = window
+        self.set_can_target(False)
+
+    def do_snapshot(self, snapshot):
+        self.window.snapshot_frame(snapshot)
+
+def append_cairo(snapshot, rect):
+    # Cairo context for a node covering rect (x, y, width, height)
+    return snapshot.append_cairo(Graphene.Rect().init(*rect))
+
+def append_highlight(snapshot, highlight, x, y, transform=None):
+    # Same picture as CursorHighlight.render(), built from GSK nodes instead of cairo paths:
+    # an outset shadow for the glow and a border node for each stroke. transform is a
+    # (squeeze_factor, offset) pair, the highlight's own press_transform() by default.
+    squeeze_factor, offset = transform if transform is not None else highlight.press_transform()
+    half = highlight.size / 2
+    if highlight.shape == HighlightShape.CIRCLE:
+        radius = half
+    else:
+        radius = highlight.clamped_corner_radius()
+    border_width = highlight.border_width
+    r, g, b, a = highlight.color
+
+    snapshot.save()
+    snapshot.translate(Graphene.Point().init(x + offset, y))
+    if squeeze_factor != 1.0:
+        snapshot.scale(squeeze_factor, 1.0)
+    if highlight.rotation:
+        snapshot.rotate(highlight.rotation)
+
+    # Strokes are centred on the path, a border node grows inwards from its outline
+    outline = _rounded_rect(half + border_width / 2, radius + border_width / 2)
+
+    stops = highlight._glow_stops()
+    if stops:
+        # The glow fades from its peak at the stroke to nothing `reach` further out. A shadow
+        # spread by half the reach and blurred by the other half covers the same falloff.
+        reach = stops[-1][0] - border_width / 2
+        snapshot.append_outset_shadow(outline, _rgba(r, g, b, stops[0][1]), 0, 0, reach / 2, reach / 2)
+
+    snapshot.append_border(outline, [border_width] * 4, [_rgba(r, g, b, a)] * 4)
+
+    inner_offset = border_width + highlight.inner_padding
+    inner_half = half - inner_offset
+    inner_width = highlight.inner_stroke_width
+    if inner_width > 0 and inner_half > 0:
+        if highlight.shape == HighlightShape.CIRCLE:
+            inner_radius = inner_half
+        else:
+            inner_radius = max(0, radius - inner_offset)
+        inner = _rounded_rect(inner_half + inner_width / 2, inner_radius + inner_width / 2)
+        snapshot.append_border(inner, [inner_width] * 4, [_rgba(r, g, b, highlight.inner_opacity)] * 4)
+
+    snapshot.restore()
+
+def _rounded_rect(half, radius):
+    # Square of side 2 * half centred on the origin
+    bounds = Graphene.Rect().init(-half, -half, 2 * half, 2 * half)
+    return Gsk.RoundedRect().init_from_rect(bounds, radius)
+
+def _rgba(red, green, blue, alpha):
+    color = Gdk.RGBA()
+    color.red, color.green, color.blue, color.alpha = red, green, blue, alpha
+    return color
@@ -0,0 +1,274 @@
+import os
+import sys
+import time
+
+from gi.repository import Gtk, Gdk, GLib
+
+# python-xlib is optional, without it only the GTK (in-window) source is available
+try:
+    from Xlib import X
+    from Xlib import display as xdisplay
+    from Xlib.ext import xinput
+    from Xlib.protocol import rq
+except ImportError:
+    xdisplay = None
+
+POLL_MIN_MS = 8  # Fastest polling interval, used while the pointer moves quickly
+POLL_MAX_MS = 250  # Slowest polling interval, used while the pointer rests
+POLL_STEP_PX = 4  # Polling aims to catch the pointer every this many pixels of travel
+
+BUTTON_MASKS = ((1, 1 << 8), (2, 1 << 9), (3, 1 << 10))  # (button, X button state mask)
+CORE_POINTER_ID = 2  # XInput2 device id of the virtual core pointer, other master pointers are MPX extras
+
+# Event types to on_pointer() kinds
+TOUCH_KINDS = {
+    Gdk.EventType.TOUCH_BEGIN: "press",
+    Gdk.EventType.TOUCH_UPDATE: "motion",
+    Gdk.EventType.TOUCH_END: "end",
+    Gdk.EventType.TOUCH_CANCEL: "end",
+}
+POINTER_KINDS = {
+    Gdk.EventType.MOTION_NOTIFY: "motion",
+    Gdk.EventType.BUTTON_PRESS: "press",
+    Gdk.EventType.BUTTON_RELEASE: "release",
+    Gdk.EventType.LEAVE_NOTIFY: "end",  # Out of the window its highlight can't be seen anyway
+}
+
+# Head of the XInput2 raw event payload, python-xlib only parses the regular device events
+RAW_EVENT_DATA = None if xdisplay is None else rq.Struct(
+    rq.Card16("deviceid"),
+    rq.Card32("time"),
+    rq.Card32("detail"),  # Button number for button events
+    rq.Card16("sourceid"),
+)
+
+class PointerSource:
+    # Delivers pointer motion as on_motion(x, y) and clicks as on_button(button, pressed),
+    # in the coordinates of the window the source was created for. Sources that see more
+    # pointers than the main one report those as on_pointer(key, kind, x, y, button),
+    # kind being "motion", "press", "release" or "end".
+    def __init__(self, on_motion, on_button, on_pointer=None):
+        self.on_motion = on_motion
+        self.on_button = on_button
+        self.on_pointer = on_pointer
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+class GtkPointerSource(PointerSource):
+    # Events GTK delivers to the window, so only while the pointer is inside it
+    def __init__(self, widget, on_motion, on_button):
+        super().__init__(on_motion, on_button)
+        self.widget = widget
+        self.motion_controller = Gtk.EventControllerMotion()
+        self.motion_controller.connect("motion", self.on_gtk_motion)
+        self.click_controller = Gtk.GestureClick()
+        self.click_controller.set_button(0)  # Every button, not just the primary one
+        self.click_controller.connect("pressed", self.on_gtk_pressed)
+        self.click_controller.connect("released", self.on_gtk_released)
+
+    def start(self):
+        self.widget.add_controller(self.motion_controller)
+        self.widget.add_controller(self.click_controller)
+
+    def stop(self):
+        self.widget.remove_controller(self.motion_controller)
+        self.widget.remove_controller(self.click_controller)
+
+    def on_gtk_motion(self, controller, x, y):
+        self.on_motion(x, y)
+
+    def on_gtk_pressed(self, gesture, n_press, x, y):
+        self.on_button(gesture.get_current_button(), True)
+
+    def on_gtk_released(self, gesture, n_press, x, y):
+        self.on_button(gesture.get_current_button(), False)
+
+class ExtraPointerSource(PointerSource):
+    # Pointers on the window besides the main one: each touch sequence, and each pointer
+    # of another seat (MPX master pointers on X11, `xinput create-master`)
+    def __init__(self, widget, on_pointer):
+        super().__init__(None, None, on_pointer)
+        self.widget = widget
+        self.main_pointer = None  # Followed by the PointerSource, its events are skipped here
+        self.controller = Gtk.EventControllerLegacy()
+        self.controller.connect("event", self.on_event)
+
+    def start(self):
+        self.main_pointer = self.widget.get_display().get_default_seat().get_pointer()
+        self.widget.add_controller(self.controller)
+
+    def stop(self):
+        self.widget.remove_controller(self.controller)
+
+    def on_event(self, controller, event):
+        event_type = event.get_event_type()
+        kind = TOUCH_KINDS.get(event_type)
+        if kind is not None:
+            key = ("touch", event.get_event_sequence())
+            button = 1
+        else:
+            kind = POINTER_KINDS.get(event_type)
+            device = event.get_device()
+            if kind is None or device is None or device == self.main_pointer:
+                return False
+            key = ("pointer", device)
+            button = event.get_button() if kind in ("press", "release") else 0
+        # Positions are in surface coordinates, the widget may sit inside client-side decorations
+        _, x, y = event.get_position()
+        offset_x, offset_y = self.widget.get_surface_transform()
+        self.on_pointer(key, kind, x - offset_x, y - offset_y, button)
+        return False
+
+class X11PointerSource(PointerSource):
+    # Base for the desktop-wide X11 sources, reads the pointer relative to our window
+    def __init__(self, xid, offset, on_motion, on_button):
+        super().__init__(on_motion, on_button)
+        self.display = xdisplay.Display()
+        self.window = self.display.create_resource_object("window", xid)
+        self.offset = offset  # Window widget origin inside the X window (client-side decorations)
+        self.position = None
+
+    def read_pointer(self):
+        # Reports motion if the pointer moved, returns its button state mask
+        pointer = self.window.query_pointer()
+        position = (pointer.win_x - self.offset[0], pointer.win_y - self.offset[1])
+        if position != self.position:
+            self.position = position
+            self.on_motion(*position)
+        return pointer.mask
+
+    def stop(self):
+        self.display.close()
+
+class XInput2PointerSource(X11PointerSource):
+    # Raw XInput2 events on the root window, event driven so it costs nothing while idle
+    def __init__(self, xid, offset, on_motion, on_button):
+        super().__init__(xid, offset, on_motion, on_button)
+        if not self.display.has_extension(xinput.extname):
+            self.display.close()
+            raise RuntimeError("XInputExtension not available")
+        version = self.display.xinput_query_version()
+        if (version.major_version, version.minor_version) < (2, 0):
+            self.display.close()
+            raise RuntimeError("XInput 2.0 not available")
+        self.opcode = self.display.get_extension_major(xinput.extname)
+        for evtype in (xinput.RawMotion, xinput.RawButtonPress, xinput.RawButtonRelease):
+            self.display.ge_add_event_data(self.opcode, evtype, RAW_EVENT_DATA)
+        self.watch_id = 0
+
+    def start(self):
+        mask = xinput.RawMotionMask | xinput.RawButtonPressMask | xinput.RawButtonReleaseMask
+        self.display.screen().root.xinput_select_events([(xinput.AllMasterDevices, mask)])
+        self.display.flush()
+        self.watch_id = GLib.io_add_watch(
+            self.display.fileno(), GLib.PRIORITY_DEFAULT, GLib.IO_IN, self.on_readable
+        )
+
+    def stop(self):
+        if self.watch_id:
+            GLib.source_remove(self.watch_id)
+            self.watch_id = 0
+        super().stop()
+
+    def on_readable(self, fd, condition):
+        # Drain everything that is queued and read the position once for the whole batch.
+        # Clicks come from the events themselves, a press and release in the same batch
+        # (tap-to-click) leave no trace in the pointer state.
+        # Events that arrive during query_pointer()'s round trip are queued by python-xlib, not
+        # left on the socket, so the watch won't fire for them: go round until none are left.
+        while self.display.pending_events():
+            changed = False
+            buttons = []
+            while self.display.pending_events():
+                event = self.display.next_event()
+                if (event.type != X.GenericEvent or event.extension != self.opcode or
+                        event.evtype not in (xinput.RawMotion, xinput.RawButtonPress, xinput.RawButtonRelease) or
+                        event.data.deviceid != CORE_POINTER_ID):
+                    continue
+                changed = True
+                if event.evtype != xinput.RawMotion and 1 <= event.data.detail <= 3:
+                    buttons.append((event.data.detail, event.evtype == xinput.RawButtonPress))
+            if changed:
+                self.read_pointer()
+            for button, pressed in buttons:
+                self.on_button(button, pressed)
+        return GLib.SOURCE_CONTINUE
+
+class PollingPointerSource(X11PointerSource):
+    # Fallback without XInput2, polls faster the faster the pointer moved recently
+    def __init__(self, xid, offset, on_motion, on_button):
+        super().__init__(xid, offset, on_motion, on_button)
+        self.interval = POLL_MAX_MS
+        self.timeout_id = 0
+        self.buttons = 0
+        self.last_poll = time.monotonic()
+
+    def start(self):
+        self.timeout_id = GLib.timeout_add(self.interval, self.poll)
+
+    def stop(self):
+        if self.timeout_id:
+            GLib.source_remove(self.timeout_id)
+            self.timeout_id = 0
+        super().stop()
+
+    def poll(self):
+        previous = self.position
+        now = time.monotonic()
+        elapsed_ms = max((now - self.last_poll) * 1000, 1)
+        self.last_poll = now
+
+        # Buttons are diffed from the pointer state, clicks shorter than a poll are missed
+        state = self.read_pointer()
+        changed = state ^ self.buttons
+        self.buttons = state
+        for button, mask in BUTTON_MASKS:
+            if changed & mask:
+                self.on_button(button, bool(state & mask))
+
+        if self.position != previous and previous is not None:
+            distance = abs(self.position[0] - previous[0]) + abs(self.position[1] - previous[1])
+            speed = distance / elapsed_ms  # px per ms
+            interval = int(POLL_STEP_PX / speed) if speed > 0 else POLL_MAX_MS
+        else:
+            # Back off while the pointer rests
+            interval = self.interval * 2
+        interval = min(max(interval, POLL_MIN_MS), POLL_MAX_MS)
+
+        if interval == self.interval:
+            return GLib.SOURCE_CONTINUE
+        self.interval = interval
+        self.timeout_id = GLib.timeout_add(interval, self.poll)
+        return GLib.SOURCE_REMOVE
+
+def get_xid(window):
+    # XID of the window's X11 surface, None when not running on X11
+    try:
+        import gi
+        gi.require_version('GdkX11', '4.0')
+        from gi.repository import GdkX11
+    except (ImportError, ValueError):
+        return None
+    surface = window.get_surface()
+    if isinstance(surface, GdkX11.X11Surface):
+        return surface.get_xid()
+    return None
+
+def create_pointer_source(window, on_motion, on_button):
+    # Best available source for a realized window: XInput2, then polling, then GTK events.
+    # CURSORGLOW_POINTER=gtk|xinput2|poll forces one.
+    wanted = os.environ.get("CURSORGLOW_POINTER")
+    xid = get_xid(window) if xdisplay is not None and wanted != "gtk" else None
+    if xid is not None:
+        offset = window.get_surface_transform()
+        kinds = {"xinput2": [XInput2PointerSource], "poll": [PollingPointerSource]}
+        for kind in kinds.get(wanted, [XInput2PointerSource, PollingPointerSource]):
+            try:
+                return kind(xid, offset, on_motion, on_button)
+            except Exception as e:
+                print(f"{kind.__name__} unavailable: {e}", file=sys.stderr)
+    return GtkPointerSource(window, on_motion, on_button)
@@ -0,0 +1,135 @@
+from enum import Enum
+
+from gi.repository import Gtk, Gdk, Adw
+
+from cursorglow_core import QUALITY_TIERS, SETTINGS, HighlightShape
+
+class PreferencesDialog(Adw.PreferencesWindow):
+    def __init__(self, parent):
+        super().__init__(title="Preferences", transient_for=parent)
+        # Built once by the app and hidden instead of destroyed on close
+        self.set_hide_on_close(True)
+        self.parent = parent
+        self.rows = {}
+        self.editors = {}
+        self.syncing = False  # Set while sync() updates widgets, their signals are ignored
+
+        page = Adw.PreferencesPage()
+        self.add(page)
+
+        #  appearance group
+        appearance_group = Adw.PreferencesGroup(title="Appearance")
+        page.add(appearance_group)
+
+        # One row per schema entry that has a title
+        for setting in SETTINGS:
+            if setting.title is None:
+                continue
+            row = Adw.ActionRow(title=setting.title)
+            editor = self.create_editor(setting, getattr(parent.highlight, setting.key))
+            row.add_suffix(editor)
+            appearance_group.add(row)
+            self.rows[setting.key] = row
+            self.editors[setting.key] = editor
+
+        # Make corner radius row sensitive only for rounded square
+        self.update_radius_sensitivity(parent.highlight.shape)
+
+        #  performance group, read only
+        performance_group = Adw.PreferencesGroup(title="Performance")
+        page.add(performance_group)
+
+        quality_row = Adw.ActionRow(title="Current Quality",
+                                    subtitle="Lowered automatically while frames take too long")
+        self.quality_label = Gtk.Label()
+        quality_row.add_suffix(self.quality_label)
+        performance_group.add(quality_row)
+        self.update_quality(parent.governor.tier)
+
+    def create_editor(self, setting, value):
+        if setting.type is bool:
+            switch = Gtk.Switch()
+            switch.set_active(value)
+            switch.set_valign(Gtk.Align.CENTER)
+            switch.connect("notify::active", self.on_switch_toggled, setting.key)
+            return switch
+
+        if setting.type is tuple:
+            color_button = Gtk.ColorButton()
+            color = Gdk.RGBA()
+            color.red, color.green, color.blue, color.alpha = value
+            color_button.set_rgba(color)
+            color_button.set_use_alpha(True)
+            color_button.connect("color-set", self.on_color_changed, setting.key)
+            return color_button
+
+        if issubclass(setting.type, Enum):
+            members = list(setting.type)
+            dropdown = Gtk.DropDown.new_from_strings(
+                [member.value.replace("_", " ").title() for member in members]
+            )
+            dropdown.set_selected(members.index(value))
+            dropdown.connect("notify::selected", self.on_dropdown_changed, setting.key, members)
+            return dropdown
+
+        adjustment = Gtk.Adjustment(
+            value=value,
+            lower=setting.lower,
+            upper=setting.upper,
+            step_increment=setting.step
+        )
+        scale = Gtk.Scale(
+            adjustment=adjustment,
+            orientation=Gtk.Orientation.HORIZONTAL
+        )
+        scale.set_hexpand(True)
+        scale.set_draw_value(True)  # Show the current value
+        scale.set_value_pos(Gtk.PositionType.RIGHT)  # Position value on right
+        scale.connect("value-changed", self.on_scale_changed, setting.key)
+        return scale
+
+    def sync(self):
+        # Show settings that were changed elsewhere (e.g. settings.json edited on disk)
+        self.syncing = True
+        for setting in SETTINGS:
+            editor = self.editors.get(setting.key)
+            if editor is None:
+                continue
+            value = getattr(self.parent.highlight, setting.key)
+            if setting.type is bool:
+                editor.set_active(value)
+            elif setting.type is tuple:
+                color = Gdk.RGBA()
+                color.red, color.green, color.blue, color.alpha = value
+                editor.set_rgba(color)
+            elif issubclass(setting.type, Enum):
+                editor.set_selected(list(setting.type).index(value))
+            else:
+                editor.set_value(value)
+        self.update_radius_sensitivity(self.parent.highlight.shape)
+        self.syncing = False
+
+    def on_scale_changed(self, scale, key):
+        if not self.syncing:
+            self.parent.set_setting(key, scale.get_value())
+
+    def on_switch_toggled(self, switch, param, key):
+        if not self.syncing:
+            self.parent.set_setting(key, switch.get_active())
+
+    def on_color_changed(self, button, key):
+        color = button.get_rgba()
+        self.parent.set_setting(key, (color.red, color.green, color.blue, color.alpha))
+
+    def on_dropdown_changed(self, dropdown, param, key, members):
+        if self.syncing:
+            return
+        self.parent.set_setting(key, members[dropdown.get_selected()])
+        if key == "shape":
+            self.update_radius_sensitivity(self.parent.highlight.shape)
+
+    def update_quality(self, tier):
+        self.quality_label.set_label(QUALITY_TIERS[tier])
+
+    def update_radius_sensitivity(self, shape):
+        self.rows["corner_radius"].set_sensitive(shape == HighlightShape.ROUNDED_SQUARE)
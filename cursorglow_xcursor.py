@@ -0,0 +1,152 @@
+# Exports the highlight as an Xcursor theme, so the compositor draws it on the
+# hardware cursor plane and the overlay doesn't have to run:
+#
+#   python3 cursorglow.py export-cursors ~/.local/share/icons
+#   python3 cursorglow_xcursor.py ~/.local/share/icons
+#
+# The same settings always produce byte-identical files. This module must not import GTK:
+# the spawned workers re-run it as their main script.
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import struct
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import cairo
+
+from cursorglow_core import PRESS_OFFSET, CursorHighlight, HighlightShape
+
+CURSOR_SIZES = (24, 32, 48, 64, 96)  # Nominal sizes desktops ask for
+BASE_SIZE = 24  # Nominal size the highlight is drawn at its configured pixel size, others scale from it
+PRESS_FRAMES = 12  # Frames from released to fully pressed, the animation plays them there and back
+FRAME_DELAY_MS = 30
+XCURSOR_MAGIC = b"Xcur"
+XCURSOR_IMAGE_TYPE = 0xfffd0002
+XCURSOR_FILE_VERSION = 0x10000
+XCURSOR_IMAGE_VERSION = 1
+
+# The highlight replaces the arrow, the busy cursors play the press animation in a loop.
+# Everything else is inherited from the base theme.
+STATIC_CURSORS = ("left_ptr", "default", "arrow", "top_left_arrow")
+ANIMATED_CURSORS = ("watch", "wait", "progress", "left_ptr_watch")
+
+def render_frame(job):
+    # (side, premultiplied little-endian ARGB pixels) of one frame, runs in a worker process.
+    # The image is as big as the highlight needs, usually larger than the nominal size.
+    settings, nominal, press_amount = job
+    highlight = CursorHighlight()
+    highlight.apply_settings(settings)
+    highlight.left_press_amount = press_amount
+    squeeze_factor, offset = highlight.press_transform()
+
+    reach = highlight.extent()
+    if highlight.shape == HighlightShape.ROUNDED_SQUARE:
+        reach += PRESS_OFFSET  # Room to slide without leaving the image
+    scale = nominal / BASE_SIZE
+    side = 2 * math.ceil(reach * scale)  # Even, so the hotspot is exactly in the middle
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, side, side)
+    ctx = cairo.Context(surface)
+    ctx.translate(side / 2, side / 2)
+    ctx.scale(scale, scale)
+    highlight.render(ctx, offset, 0, squeeze_factor)
+    surface.flush()
+
+    # ARGB32 rows are exactly width * 4 bytes, so the data is already tightly packed
+    pixels = array("I", bytes(surface.get_data()))
+    if sys.byteorder == "big":
+        pixels.byteswap()
+    return side, pixels.tobytes()
+
+def xcursor_file(images):
+    # Xcursor file holding (nominal size, side, delay ms, pixels) images, in the given order
+    toc = []
+    chunks = []
+    position = 16 + 12 * len(images)
+    for nominal, side, delay, pixels in images:
+        chunk = struct.pack("<9I", 36, XCURSOR_IMAGE_TYPE, nominal, XCURSOR_IMAGE_VERSION,
+                            side, side, side // 2, side // 2, delay) + pixels
+        toc.append(struct.pack("<3I", XCURSOR_IMAGE_TYPE, nominal, position))
+        chunks.append(chunk)
+        position += len(chunk)
+    header = struct.pack("<4s3I", XCURSOR_MAGIC, 16, XCURSOR_FILE_VERSION, len(images))
+    return header + b"".join(toc) + b"".join(chunks)
+
+def export_theme(settings, directory, name, inherits, sizes=CURSOR_SIZES, jobs=None):
+    highlight = CursorHighlight()
+    highlight.apply_settings(settings)
+    settings = highlight.to_settings()  # Validated, and the same for every worker
+    if highlight.animation_enabled:
+        steps = [i / (PRESS_FRAMES - 1) for i in range(PRESS_FRAMES)]
+        press_amounts = steps + steps[-2:0:-1]
+    else:
+        press_amounts = [0.0]
+
+    # Frame 0 of every size is the released highlight, used for the static cursors
+    work = [(settings, size, amount) for size in sizes for amount in press_amounts]
+    # Spawned workers re-run the main script, cursorglow.py hands over to this module before
+    # importing GTK so they only load it and cursorglow_core
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context("spawn")) as pool:
+        frames = list(pool.map(render_frame, work, chunksize=4))
+
+    static = []
+    animated = []
+    for i, size in enumerate(sizes):
+        size_frames = frames[i * len(press_amounts):(i + 1) * len(press_amounts)]
+        side, pixels = size_frames[0]
+        static.append((size, side, 0, pixels))
+        animated.extend((size, side, FRAME_DELAY_MS, pixels) for side, pixels in size_frames)
+
+    theme_dir = os.path.join(directory, name)
+    cursors_dir = os.path.join(theme_dir, "cursors")
+    os.makedirs(cursors_dir, exist_ok=True)
+    with open(os.path.join(theme_dir, "index.theme"), "w") as f:
+        f.write(f"[Icon Theme]\nName={name}\nComment=Cursor highlight exported by CursorGlow\n"
+                f"Inherits={inherits}\n")
+    for names, images in ((STATIC_CURSORS, static), (ANIMATED_CURSORS, animated)):
+        with open(os.path.join(cursors_dir, names[0]), "wb") as f:
+            f.write(xcursor_file(images))
+        for alias in names[1:]:
+            path = os.path.join(cursors_dir, alias)
+            if os.path.lexists(path):
+                os.remove(path)
+            os.symlink(names[0], path)
+    return theme_dir
+
+def default_settings_path():
+    # The app's settings.json, the way GLib.get_user_config_dir() finds it
+    config_dir = os.environ.get("XDG_CONFIG_HOME")
+    if not config_dir or not os.path.isabs(config_dir):
+        config_dir = os.path.expanduser("~/.config")
+    return os.path.join(config_dir, "cursorglow", "settings.json")
+
+def main(argv, settings_path=None):
+    parser = argparse.ArgumentParser(description="Export the highlight as an Xcursor theme")
+    parser.add_argument("directory", help="where the theme directory is created, e.g. ~/.local/share/icons")
+    parser.add_argument("--name", default="CursorGlow", help="theme name")
+    parser.add_argument("--inherits", default="Adwaita", help="theme the other cursors come from")
+    parser.add_argument("--settings", default=settings_path or default_settings_path(), help="settings.json to export")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(CURSOR_SIZES), help="nominal cursor sizes")
+    parser.add_argument("--jobs", type=int, help="worker processes, defaults to the number of CPUs")
+    args = parser.parse_args(argv)
+
+    settings = {}
+    try:
+        with open(args.settings, "r") as f:
+            settings = json.load(f)
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        print(f"Could not read {args.settings}: {e}", file=sys.stderr)
+        return 1
+
+    theme_dir = export_theme(settings, os.path.expanduser(args.directory), args.name, args.inherits,
+                             sorted(set(args.sizes)), args.jobs)
+    print(f"Wrote {theme_dir}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,15 @@
+# The steady-state frame path must not keep memory. tracemalloc can't tell which short-lived
+# objects the interpreter recycles (floats, bound methods, cairo wrappers), so the check is
+# that nothing is retained across thousands of frames, not that nothing is allocated.
+import pytest
+
+pytest.importorskip("cairo")
+
+from benchmark import ALLOCATION_CASES, measure_allocations
+
+FRAMES = 3000
+
+@pytest.mark.parametrize("case", sorted(ALLOCATION_CASES))
+def test_frame_path_retains_nothing(case):
+    result = measure_allocations(case, FRAMES, 640, 480)
+    assert result["retained_blocks"] == 0, result["growing_lines"]
@@ -0,0 +1,73 @@
+# On-disk sprite atlases: a damaged or foreign file must never be used, only deleted so it
+# gets rebuilt, and drawing falls back to live rendering meanwhile.
+import os
+import time
+
+import pytest
+
+pytest.importorskip("cairo")
+
+from cursorglow_core import (
+    ATLAS_HEADER, ATLAS_TEMP_AGE, CursorHighlight, HighlightShape, SpriteAtlas, evict_atlases, save_atlas
+)
+
+SCALE = 1.0
+
+@pytest.fixture
+def atlas(tmp_path):
+    # (highlight, path, digest) of a freshly written atlas
+    highlight = CursorHighlight()
+    highlight.apply_settings({"shape": HighlightShape.CIRCLE, "size": 30, "glow_size": 5})
+    highlight.atlas_dir = str(tmp_path)
+    assert save_atlas(str(tmp_path), highlight.to_settings(), SCALE)
+    digest = highlight.atlas_digest(SCALE)
+    return highlight, highlight.atlas_path(digest), digest
+
+def test_load_round_trip(atlas):
+    highlight, path, digest = atlas
+    loaded = SpriteAtlas.load(path, digest)
+    assert loaded is not None
+    assert sorted(loaded.sprites) == sorted(highlight.press_squeezes())
+    assert not save_atlas(highlight.atlas_dir, highlight.to_settings(), SCALE)  # Already there
+
+def test_truncated_atlas_is_deleted(atlas):
+    _, path, digest = atlas
+    os.truncate(path, os.path.getsize(path) // 2)
+    assert SpriteAtlas.load(path, digest) is None
+    assert not os.path.exists(path)
+
+def test_header_only_atlas_is_deleted(atlas):
+    _, path, digest = atlas
+    os.truncate(path, ATLAS_HEADER.size - 1)
+    assert SpriteAtlas.load(path, digest) is None
+    assert not os.path.exists(path)
+
+def test_corrupt_magic_is_deleted(atlas):
+    _, path, digest = atlas
+    with open(path, "r+b") as f:
+        f.write(b"NOTANATL")
+    assert SpriteAtlas.load(path, digest) is None
+    assert not os.path.exists(path)
+
+def test_mismatched_digest_is_deleted(atlas):
+    _, path, digest = atlas
+    assert SpriteAtlas.load(path, bytes(len(digest))) is None
+    assert not os.path.exists(path)
+
+def test_missing_atlas_falls_back_to_rendering(atlas):
+    highlight, path, digest = atlas
+    os.truncate(path, 10)
+    sprite = highlight.get_sprite(1.0, SCALE)
+    assert sprite.get_width() == 2 * highlight.extent()
+    assert not os.path.exists(path)
+
+def test_eviction_sweeps_abandoned_temporary_files(tmp_path):
+    stale = tmp_path / ".atlas-stale.tmp"
+    fresh = tmp_path / ".atlas-fresh.tmp"
+    stale.write_bytes(b"x")
+    fresh.write_bytes(b"x")
+    old = time.time() - ATLAS_TEMP_AGE - 60
+    os.utime(stale, (old, old))
+    evict_atlases(str(tmp_path))
+    assert not stale.exists()
+    assert fresh.exists()  # Possibly still being written
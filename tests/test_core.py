@@ -0,0 +1,131 @@
+# GTK-free checks of the core building blocks: animation curves, the ripple pool and
+# settings validation.
+import math
+
+import pytest
+
+pytest.importorskip("cairo")
+
+from cursorglow_core import (
+    ANIMATION_STEP, RIPPLE_POOL_SIZE, SETTINGS_BY_KEY, AnimationCurve, AnimationEngine, HighlightShape,
+    RipplePool
+)
+
+MAX_STEPS = 10 * 240  # Ten seconds of frames at the integrator rate, any curve settles well within that
+
+def engine_for(curve, speed=5.0):
+    engine = AnimationEngine(2)
+    engine.curve = curve
+    engine.speed = speed
+    return engine
+
+def run(engine, delta_time, duration):
+    for _ in range(round(duration / delta_time)):
+        engine.advance(delta_time)
+
+@pytest.mark.parametrize("curve", list(AnimationCurve))
+def test_curve_reaches_target_exactly(curve):
+    engine = engine_for(curve)
+    engine.set_target(0, 1.0)
+    engine.set_target(1, -0.25)
+    for steps in range(MAX_STEPS):
+        if engine.settled():
+            break
+        engine.advance(ANIMATION_STEP)
+    assert engine.settled(), f"{curve} not settled after {steps} steps"
+    assert engine.value[0] == 1.0
+    assert engine.value[1] == -0.25
+    assert engine.velocity[0] == engine.velocity[1] == 0.0
+
+@pytest.mark.parametrize("curve", list(AnimationCurve))
+def test_curve_retargets_midway(curve):
+    # Released halfway through a press: heads back and still lands exactly
+    engine = engine_for(curve)
+    engine.set_target(0, 1.0)
+    run(engine, ANIMATION_STEP, 0.05)
+    assert 0.0 < engine.value[0] < 1.0
+    engine.set_target(0, 0.0)
+    run(engine, ANIMATION_STEP, MAX_STEPS * ANIMATION_STEP)
+    assert engine.settled()
+    assert engine.value[0] == 0.0
+
+@pytest.mark.parametrize("curve", list(AnimationCurve))
+def test_curve_is_frame_rate_independent(curve):
+    slow = engine_for(curve)
+    fast = engine_for(curve)
+    for engine in (slow, fast):
+        engine.set_target(0, 1.0)
+    run(slow, 1 / 60, 0.1)
+    run(fast, 1 / 240, 0.1)
+    # Rounding in the accumulator may shift a step across a frame boundary, no more
+    assert slow.value[0] == pytest.approx(fast.value[0], abs=0.05)
+    run(slow, 1 / 60, 5.0)
+    run(fast, 1 / 240, 5.0)
+    assert slow.settled() and fast.settled()
+    assert slow.value[0] == fast.value[0] == 1.0
+
+def test_long_frame_gap_is_clamped():
+    # A stalled frame advances at most MAX_ANIMATION_DELTA instead of jumping to the end
+    engine = engine_for(AnimationCurve.LINEAR, speed=1.0)
+    engine.set_target(0, 1.0)
+    engine.advance(10.0)
+    assert 0.0 < engine.value[0] < 1.0
+
+def test_ripples_respect_limit_and_recycle_the_oldest():
+    pool = RipplePool()
+    for i in range(3):
+        pool.spawn(float(i), i, 0.0, limit=3)
+    assert pool.count == 3
+
+    pool.spawn(3.0, 3, 0.0, limit=3)
+    assert pool.count == 3
+    live = sorted((pool.starts[i], pool.xs[i]) for i in range(pool.capacity) if pool.starts[i] >= 0)
+    assert live == [(1.0, 1), (2.0, 2), (3.0, 3)]  # The one started at 0 made way
+
+def test_ripple_pool_never_grows():
+    pool = RipplePool()
+    for i in range(3 * RIPPLE_POOL_SIZE):
+        pool.spawn(float(i), 0.0, 0.0, limit=RIPPLE_POOL_SIZE + 10)
+    assert pool.count == RIPPLE_POOL_SIZE
+    assert len(pool.starts) == RIPPLE_POOL_SIZE
+
+def test_ripples_expire():
+    pool = RipplePool()
+    pool.spawn(0.0, 0.0, 0.0, limit=8)
+    pool.spawn(0.3, 0.0, 0.0, limit=8)
+    pool.update(0.5, lifetime=0.4)
+    assert pool.count == 1
+
+def test_validate_clamps_numbers():
+    size = SETTINGS_BY_KEY["size"]
+    assert size.validate(1000) == 100.0
+    assert size.validate(-5) == 10.0
+    assert size.validate(42) == 42.0
+    assert isinstance(size.validate(42), float)
+
+    ripple_max = SETTINGS_BY_KEY["ripple_max"]
+    assert ripple_max.validate(4.6) == 5
+    assert isinstance(ripple_max.validate(4.6), int)
+    assert ripple_max.validate(10 ** 6) == RIPPLE_POOL_SIZE
+
+    color = SETTINGS_BY_KEY["color"]
+    assert color.validate([2, -1, 0.5, 1]) == (1.0, 0.0, 0.5, 1.0)
+
+    shape = SETTINGS_BY_KEY["shape"]
+    assert shape.validate("circle") is HighlightShape.CIRCLE
+    assert shape.validate(HighlightShape.CIRCLE) is HighlightShape.CIRCLE
+
+@pytest.mark.parametrize("key, value", [
+    ("size", "50"),
+    ("size", True),
+    ("size", math.nan),
+    ("size", None),
+    ("animation_enabled", 1),
+    ("color", [1, 1, 1]),
+    ("color", "#ffffff"),
+    ("color", [1, 1, True, 1]),
+    ("shape", "hexagon"),
+])
+def test_validate_rejects_malformed_values(key, value):
+    with pytest.raises(ValueError):
+        SETTINGS_BY_KEY[key].validate(value)
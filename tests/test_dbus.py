@@ -0,0 +1,99 @@
+# Runs the app against a private dbus-daemon and drives it through the Control interface.
+# Needs GTK, a display and dbus-daemon, skipped otherwise.
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import pytest
+
+gi = pytest.importorskip("gi")
+from gi.repository import Gio, GLib
+
+APP_ID = "com.renchon.cursorglow"
+OBJECT_PATH = "/com/renchon/cursorglow"
+DBUS_INTERFACE = "com.renchon.cursorglow.Control"
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cursorglow.py")
+
+pytestmark = [
+    pytest.mark.skipif(shutil.which("dbus-daemon") is None, reason="dbus-daemon not installed"),
+    pytest.mark.skipif(not (os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY")),
+                       reason="no display to open the overlay on"),
+]
+
+@pytest.fixture
+def bus(tmp_path):
+    # Connection to a private bus with the app running on it, settings and profiles in tmp_path
+    profiles = tmp_path / "config" / "cursorglow" / "profiles"
+    profiles.mkdir(parents=True)
+    (profiles / "small.json").write_text(json.dumps({"size": 30}))
+    (profiles / "broken.json").mkdir()  # Can't be read as a file
+
+    daemon = subprocess.Popen(["dbus-daemon", "--session", "--nofork", "--print-address"],
+                              stdout=subprocess.PIPE, text=True)
+    address = daemon.stdout.readline().strip()
+    env = {**os.environ, "DBUS_SESSION_BUS_ADDRESS": address,
+           "XDG_CONFIG_HOME": str(tmp_path / "config"), "XDG_CACHE_HOME": str(tmp_path / "cache")}
+    app = subprocess.Popen([sys.executable, APP_PATH], env=env)
+    connection = Gio.DBusConnection.new_for_address_sync(
+        address, Gio.DBusConnectionFlags.AUTHENTICATION_CLIENT | Gio.DBusConnectionFlags.MESSAGE_BUS_CONNECTION,
+        None, None
+    )
+    try:
+        # Until the app owns its name and has its window open
+        deadline = time.monotonic() + 20
+        while True:
+            try:
+                call(connection, "GetStats")
+                break
+            except GLib.Error:
+                if time.monotonic() > deadline or app.poll() is not None:
+                    raise
+                time.sleep(0.1)
+        yield connection
+    finally:
+        connection.close_sync(None)
+        app.terminate()
+        app.wait(10)
+        daemon.terminate()
+        daemon.wait(10)
+
+def call(connection, method, parameters=None):
+    return connection.call_sync(APP_ID, OBJECT_PATH, DBUS_INTERFACE, method, parameters, None,
+                                Gio.DBusCallFlags.NONE, 5000, None).unpack()
+
+def error_name(connection, method, parameters):
+    with pytest.raises(GLib.Error) as info:
+        call(connection, method, parameters)
+    return Gio.DBusError.get_remote_error(info.value)
+
+def test_control_interface(bus):
+    settings = {"size": GLib.Variant("d", 80.0), "trail_enabled": GLib.Variant("b", True)}
+    changed, = call(bus, "ApplySettings", GLib.Variant("(a{sv})", (settings,)))
+    assert sorted(changed) == ["size", "trail_enabled"]
+    changed, = call(bus, "ApplySettings", GLib.Variant("(a{sv})", (settings,)))
+    assert changed == []
+
+    # One bad entry rejects the whole batch
+    unknown = {"size": GLib.Variant("d", 40.0), "no_such_setting": GLib.Variant("i", 1)}
+    assert error_name(bus, "ApplySettings", GLib.Variant("(a{sv})", (unknown,))) == \
+        "org.freedesktop.DBus.Error.InvalidArgs"
+    bad = {"size": GLib.Variant("d", 40.0), "trail_enabled": GLib.Variant("s", "yes")}
+    assert error_name(bus, "ApplySettings", GLib.Variant("(a{sv})", (bad,))) == \
+        "org.freedesktop.DBus.Error.InvalidArgs"
+
+    # The profile sets the size and resets the trail to its default
+    changed, = call(bus, "SwitchProfile", GLib.Variant("(s)", ("small",)))
+    assert sorted(changed) == ["size", "trail_enabled"]
+    assert error_name(bus, "SwitchProfile", GLib.Variant("(s)", ("missing",))) == \
+        f"{DBUS_INTERFACE}.Error.UnknownProfile"
+    assert error_name(bus, "SwitchProfile", GLib.Variant("(s)", ("../small",))) == \
+        "org.freedesktop.DBus.Error.InvalidArgs"
+    assert error_name(bus, "SwitchProfile", GLib.Variant("(s)", ("broken",))) == \
+        "org.freedesktop.DBus.Error.Failed"
+
+    stats, = call(bus, "GetStats")
+    assert {"frames", "missed_frames", "draw_p99_us", "quality_tier"} <= stats.keys()
+    assert stats["quality_tier"] in range(4)
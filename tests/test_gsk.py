@@ -0,0 +1,62 @@
+# The render node backend must look like the cairo one. Its nodes are rasterized with cairo,
+# as GSK_RENDERER=cairo does, which needs GTK 4 but no display.
+import itertools
+import os
+
+import pytest
+
+cairo = pytest.importorskip("cairo")
+gi = pytest.importorskip("gi")
+try:
+    gi.require_version("Gtk", "4.0")
+except ValueError:
+    pytest.skip("GTK 4 not installed", allow_module_level=True)
+
+os.environ.setdefault("GSK_RENDERER", "cairo")
+from cursorglow_core import CursorHighlight, HighlightShape
+from cursorglow_gsk import Gtk, append_highlight
+
+MAX_MEAN_DIFFERENCE = 0.02  # Mean per-channel difference allowed, fraction of full scale
+
+CASES = list(itertools.product(
+    [HighlightShape.ROUNDED_SQUARE, HighlightShape.CIRCLE], [0, 10, 30], [0, 45], ["idle", "pressed"]
+))
+
+def pixel_difference(a, b):
+    # Mean and largest per-channel difference of two equally sized surfaces, 0..1
+    a.flush()
+    b.flush()
+    data_a = bytes(a.get_data())
+    data_b = bytes(b.get_data())
+    total = 0
+    largest = 0
+    for x, y in zip(data_a, data_b):
+        d = abs(x - y)
+        total += d
+        if d > largest:
+            largest = d
+    return total / len(data_a) / 255, largest / 255
+
+@pytest.mark.parametrize("shape, glow_size, rotation, state", CASES,
+                         ids=[f"{s.value}-glow{g}-rot{r}-{p}" for s, g, r, p in CASES])
+def test_gsk_matches_cairo(shape, glow_size, rotation, state):
+    highlight = CursorHighlight()
+    highlight.apply_settings({"shape": shape, "size": 50, "glow_size": glow_size, "rotation": rotation})
+    if state == "pressed":
+        highlight.left_press_target = 1.0
+        highlight.left_press_amount = 1.0
+    highlight.update_animations(0.0)
+    half = highlight.extent() + 12  # Room for the press offset
+    side = 2 * half
+
+    expected = cairo.ImageSurface(cairo.FORMAT_ARGB32, side, side)
+    squeeze_factor, offset = highlight.press_transform()
+    highlight.render(cairo.Context(expected), half + offset, half, squeeze_factor)
+
+    snapshot = Gtk.Snapshot()
+    append_highlight(snapshot, highlight, half, half)
+    actual = cairo.ImageSurface(cairo.FORMAT_ARGB32, side, side)
+    snapshot.to_node().draw(cairo.Context(actual))
+
+    mean, largest = pixel_difference(expected, actual)
+    assert mean <= MAX_MEAN_DIFFERENCE, f"mean {mean:.4f}, max {largest:.3f}"
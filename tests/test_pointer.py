@@ -0,0 +1,76 @@
+# The XInput2 pointer source (what CURSORGLOW_POINTER=xinput2 picks) against a private Xvfb,
+# with the pointer driven through XTest. Skipped without Xvfb, python-xlib or GTK 4.
+import os
+import shutil
+import subprocess
+import time
+
+import pytest
+
+gi = pytest.importorskip("gi")
+try:
+    gi.require_version("Gtk", "4.0")
+except ValueError:
+    pytest.skip("GTK 4 not installed", allow_module_level=True)
+pytest.importorskip("Xlib.ext.xtest")
+from gi.repository import GLib
+from Xlib import X
+from Xlib import display as xdisplay
+
+pytestmark = pytest.mark.skipif(shutil.which("Xvfb") is None, reason="Xvfb not installed")
+
+@pytest.fixture
+def display(monkeypatch):
+    # Connection to a fresh Xvfb, which picks a free display number and reports it
+    read_fd, write_fd = os.pipe()
+    server = subprocess.Popen(["Xvfb", "-displayfd", str(write_fd), "-nolisten", "tcp",
+                               "-screen", "0", "640x480x24"], pass_fds=(write_fd,))
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        name = f":{f.readline().strip()}"
+    connection = xdisplay.Display(name)
+    monkeypatch.setenv("DISPLAY", name)  # The source opens its own connection
+    try:
+        yield connection
+    finally:
+        connection.close()
+        server.terminate()
+        server.wait(10)
+
+def run_until(condition, timeout=5):
+    # Iterate the default main context until condition() holds, False on timeout
+    context = GLib.MainContext.default()
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        if not context.iteration(False):
+            time.sleep(0.005)
+    return True
+
+def test_xinput2_reports_motion_and_clicks(display):
+    from cursorglow_pointer import XInput2PointerSource
+
+    screen = display.screen()
+    window = screen.root.create_window(0, 0, 640, 480, 0, screen.root_depth)
+    window.map()
+    display.sync()
+
+    motions = []
+    buttons = []
+    source = XInput2PointerSource(window.id, (0, 0), lambda x, y: motions.append((x, y)),
+                                  lambda button, pressed: buttons.append((button, pressed)))
+    source.start()
+    try:
+        display.xtest_fake_input(X.MotionNotify, x=100, y=120)
+        display.sync()
+        assert run_until(lambda: (100, 120) in motions)
+
+        # Press and release in one batch, like tap-to-click: both must arrive, in order
+        display.xtest_fake_input(X.ButtonPress, 1)
+        display.xtest_fake_input(X.ButtonRelease, 1)
+        display.sync()
+        assert run_until(lambda: len(buttons) >= 2)
+        assert buttons == [(1, True), (1, False)]
+    finally:
+        source.stop()
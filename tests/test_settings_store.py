@@ -0,0 +1,58 @@
+import json
+import os
+import stat
+import time
+
+import pytest
+
+pytest.importorskip("gi")
+from gi.repository import GLib
+
+from cursorglow import SAVE_DELAY_MS, SettingsStore, write_atomic
+
+def run_until(condition, timeout=5):
+    # Iterate the default main context until condition() holds, False on timeout
+    context = GLib.MainContext.default()
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        if not context.iteration(False):
+            time.sleep(0.005)
+    return True
+
+def test_burst_is_written_once(tmp_path):
+    # A slider drag: 100 changes in a row end up as a single write of the last one
+    path = tmp_path / "settings.json"
+    store = SettingsStore(str(path))
+    for i in range(100):
+        store.schedule_save({"size": float(i)})
+    assert run_until(lambda: store.writes)
+
+    # Nothing else is still queued
+    assert not run_until(lambda: store.writes > 1, timeout=2 * SAVE_DELAY_MS / 1000)
+    assert store.writes == 1
+    assert json.loads(path.read_text()) == {"size": 99.0}
+
+def test_write_keeps_symlink_and_mode(tmp_path):
+    # A settings file linked in from elsewhere is written through, with its permissions kept
+    target = tmp_path / "dotfiles" / "settings.json"
+    target.parent.mkdir()
+    target.write_text("{}")
+    target.chmod(0o640)
+    link = tmp_path / "settings.json"
+    link.symlink_to(target)
+
+    write_atomic(str(link), '{"size": 1}')
+    assert link.is_symlink()
+    assert target.read_text() == '{"size": 1}'
+    assert stat.S_IMODE(target.stat().st_mode) == 0o640
+
+def test_new_file_follows_umask(tmp_path):
+    path = tmp_path / "settings.json"
+    umask = os.umask(0o022)
+    try:
+        write_atomic(str(path), "{}")
+    finally:
+        os.umask(umask)
+    assert stat.S_IMODE(path.stat().st_mode) == 0o644